@@ -0,0 +1,217 @@
+#!/usr/bin/python3
+from data import Data
+from examples import DATASETS
+from decisionTree import RandomForest
+from table import Table
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+
+def scaleData(data, factor, rng):
+    '''
+    Returns a Data object with 'factor' copies of every instance of 'data'. Numeric
+    values of the copies get 1% of gaussian noise, so they don't repeat the same
+    thresholds.
+    '''
+    source = data.table
+    table = Table(source.className, source.numericAttr)
+    table.setKeys(source.keys)
+    for key in source.keys:
+        column = source.columns[key]
+        if table.isNumeric(key):
+            table.columns[key].extend(column)
+            for i in range(factor - 1):
+                table.columns[key].extend([x*(1 + rng.gauss(0, 0.01)) for x in column])
+        else:
+            table.labels[key] = list(source.labels[key])
+            table.codes[key] = dict(source.codes[key])
+            for i in range(factor):
+                table.columns[key].extend(column)
+    table.size = len(source)*factor
+    return Data(data.className, data.numericAttr, table=table)
+
+
+def peakMemory():
+    '''
+    Returns the peak resident set size of this process in kilobytes.
+    '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak//1024 if sys.platform == 'darwin' else peak
+
+
+def bestTime(function, repeat):
+    '''
+    Calls 'function' 'repeat' times, so a single slow run doesn't count as a
+    regression.
+    Returns a tuple with the shortest time a call took, in seconds, and the result of
+    the last call.
+    '''
+    best = None
+    for i in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def benchmarkDataset(name, scale=1, nTrees=10, seed=0, classifyRows=1000, repeat=3):
+    '''
+    Measures loading, training and classifying one dataset, keeping the best of
+    'repeat' runs of each measurement. Runs in its own process (see runBenchmarks) so
+    the peak memory belongs to this dataset only.
+    Returns a dictionary with the measurements.
+    '''
+    setup = DATASETS[name]
+    parseSeconds, data = bestTime(lambda: setup(cache=False), repeat)
+    setup(cache=True)   #Makes sure the cache is written
+    cachedSeconds, data = bestTime(lambda: setup(cache=True), repeat)
+
+    if scale > 1:
+        data = scaleData(data, scale, random.Random(seed))
+
+    def train():
+        forest = RandomForest(data.view(None), None, seed=seed)
+        forest.generateForest(nTrees)
+        return forest
+    trainSeconds, forest = bestTime(train, repeat)
+
+    #Classifies up to 'classifyRows' instances one at a time
+    instances = data.view(array('i', range(min(classifyRows, data.size())))).instances
+    classifySeconds = bestTime(lambda: [forest.classify(instance) for instance in instances],
+                               repeat)[0]
+
+    compiled = forest.compile()
+    batchSeconds = bestTime(lambda: compiled.predictBatch(data), repeat)[0]
+
+    return {'dataset': name, 'scale': scale, 'rows': data.size(),
+            'attributes': len(data.attributes), 'trees': nTrees, 'repeat': repeat,
+            'classifyRows': len(instances),
+            'parseSeconds': parseSeconds, 'cachedLoadSeconds': cachedSeconds,
+            'trainSecondsPerTree': trainSeconds/nTrees,
+            'classifyRowsPerSecond': len(instances)/classifySeconds,
+            'batchRowsPerSecond': data.size()/batchSeconds,
+            'peakRssKb': peakMemory()}
+
+
+def runBenchmarks(cases, nTrees=10, seed=0, repeat=3):
+    '''
+    Runs benchmarkDataset for every (dataset name, scale) in 'cases', each in a new
+    worker process, repeating each measurement 'repeat' times.
+    Returns the list of results.
+    '''
+    results = []
+    for name, scale in cases:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(benchmarkDataset, name, scale, nTrees, seed,
+                                     repeat=repeat).result()
+        print("{dataset} x{scale}: {rows} rows, parse {parseSeconds:.3f}s, cached load "
+              "{cachedLoadSeconds:.4f}s, {trainSecondsPerTree:.3f}s/tree, classify "
+              "{classifyRowsPerSecond:.0f} rows/s, batch {batchRowsPerSecond:.0f} rows/s, "
+              "peak {peakRssKb} KB".format(**result))
+        results.append(result)
+    return results
+
+
+def currentCommit():
+    '''
+    Returns the hash of the checked out git commit, or None outside a repository.
+    '''
+    try:
+        output = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.strip()
+
+
+def measuredSeconds(result, measurement):
+    '''
+    Returns the time behind a measurement of a benchmarkDataset result, or None for the
+    ones that aren't timings.
+    '''
+    if measurement in ('parseSeconds', 'cachedLoadSeconds'):
+        return result[measurement]
+    if measurement == 'trainSecondsPerTree':
+        return result[measurement]*result['trees']
+    if measurement == 'classifyRowsPerSecond':
+        return result.get('classifyRows', min(1000, result['rows']))/result[measurement]
+    if measurement == 'batchRowsPerSecond':
+        return result['rows']/result[measurement]
+    return None
+
+
+def compareResults(previous, current, tolerance=0.1, minSeconds=0.01):
+    '''
+    Prints the relative change of every measurement between two benchmark files,
+    flagging the ones more than 'tolerance' worse. Timings shorter than 'minSeconds'
+    in either file are mostly noise and are never flagged.
+    Returns the number of regressions.
+    '''
+    # Measurements where a higher value is better
+    higherBetter = ('classifyRowsPerSecond', 'batchRowsPerSecond')
+    measurements = ('parseSeconds', 'cachedLoadSeconds', 'trainSecondsPerTree',
+                    'classifyRowsPerSecond', 'batchRowsPerSecond', 'peakRssKb')
+    old = {(result['dataset'], result['scale']): result for result in previous['results']}
+    regressions = 0
+    for result in current['results']:
+        key = (result['dataset'], result['scale'])
+        if key not in old:
+            continue
+        for measurement in measurements:
+            before, after = old[key][measurement], result[measurement]
+            if before == 0:
+                continue
+            change = after/before - 1
+            worse = -change if measurement in higherBetter else change
+            seconds = [measuredSeconds(x, measurement) for x in (old[key], result)]
+            flag = ''
+            if seconds[0] is not None and min(seconds) < minSeconds:
+                flag = '  (too short to compare)'
+            elif worse > tolerance:
+                flag = '  <-- regression'
+                regressions += 1
+            print("{} x{} {}: {:.4g} -> {:.4g} ({:+.1f}%){}".format(
+                key[0], key[1], measurement, before, after, change*100, flag))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks training and classifying "
+                                                 "the bundled datasets")
+    parser.add_argument('--datasets', default=','.join(DATASETS),
+                        help="comma separated list of datasets (default: all)")
+    parser.add_argument('--scales', default='1,4',
+                        help="comma separated list of times each dataset is replicated")
+    parser.add_argument('--trees', type=int, default=10, help="trees in each forest")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="runs of each measurement, the best one is kept")
+    parser.add_argument('--min-seconds', type=float, default=0.01,
+                        help="timings shorter than this are not compared")
+    parser.add_argument('--output', default='benchmark.json', help="JSON file to write")
+    parser.add_argument('--compare', help="previous JSON file to compare the results with")
+    args = parser.parse_args()
+
+    cases = [(name, int(scale)) for name in args.datasets.split(',')
+             for scale in args.scales.split(',')]
+    report = {'commit': currentCommit(), 'python': platform.python_version(),
+              'platform': platform.platform(), 'trees': args.trees, 'seed': args.seed,
+              'results': runBenchmarks(cases, args.trees, args.seed, args.repeat)}
+    with open(args.output, mode='w') as jsonFile:
+        json.dump(report, jsonFile, indent=2)
+    print("Results written to {}".format(args.output))
+
+    if args.compare:
+        with open(args.compare) as jsonFile:
+            previous = json.load(jsonFile)
+        if compareResults(previous, report, minSeconds=args.min_seconds) > 0:
+            sys.exit(1)
@@ -0,0 +1,329 @@
+import csv
+import time
+from array import array
+from data import Data
+from table import Table, readCsv
+from storage import writeArrays, readArrays
+
+# Identifies model files written by CompiledForest.save
+MODEL_MAGIC = b'RFMD'
+MODEL_VERSION = 1
+# Node and child table arrays, in the order they are saved
+MODEL_ARRAYS = ('roots', 'feature', 'threshold', 'left', 'right', 'value', 'catStart',
+                'catCount', 'fallback', 'catValue', 'catChild')
+
+
+class CompiledForest(object):
+    """
+    Trained trees flattened into parallel arrays, indexed by node, for fast batch
+    prediction. Every node has a feature index (-1 for leaves), numeric nodes send
+    values <= threshold to 'left' and the others to 'right', categoric nodes look their
+    value up in the catValue/catChild range starting at catStart and go to 'fallback'
+    when it is not found, and leaves hold the class index in 'value'.
+    """
+
+    def __init__(self, className, features, numeric, categories, classes):
+        """
+        :param features: names of the attributes used by the trees
+        :param numeric: list with True for each numeric feature
+        :param categories: dictionary mapping each categoric feature to its labels
+        :param classes: class labels, indexed by the leaf values
+        """
+        self.className = className
+        self.features = features
+        self.numeric = numeric
+        self.categories = categories
+        self.classes = classes
+        # First node of each tree
+        self.roots = array('i')
+        # Node arrays
+        self.feature = array('i')
+        self.threshold = array('d')
+        self.left = array('i')
+        self.right = array('i')
+        self.value = array('i')
+        self.catStart = array('i')
+        self.catCount = array('i')
+        self.fallback = array('i')
+        # Categoric child tables
+        self.catValue = array('i')
+        self.catChild = array('i')
+
+    def __repr__(self):
+        return "<CompiledForest {} trees {} nodes>".format(len(self.roots), len(self.feature))
+
+    @classmethod
+    def fromTrees(cls, trees, classes=None):
+        """
+        Flattens trained DecisionTrees.
+        :param classes: class labels in the order used for leaf values, labels found in
+                        the leaves are appended to it
+        """
+        forest = cls(None, [], [], {}, list(classes) if classes is not None else [])
+        for tree in trees:
+            if not tree.root:
+                raise AttributeError("The decision tree has not yet been trained")
+            if forest.className is None:
+                forest.className = tree.className
+            forest.addTree(tree)
+        return forest
+
+    def save(self, filename):
+        """
+        Writes the forest to a compact binary file, which can be read with load.
+        """
+        meta = {'className': self.className, 'features': self.features,
+                'numeric': self.numeric, 'categories': self.categories,
+                'classes': self.classes}
+        writeArrays(filename, MODEL_MAGIC, MODEL_VERSION, meta,
+                    {name: getattr(self, name) for name in MODEL_ARRAYS})
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Reads a forest written by save. The node arrays are memory-mapped instead of
+        read, so loading takes the same time for any forest size and processes loading
+        the same file share its memory. A loaded forest can't have trees added to it.
+        """
+        meta, arrays = readArrays(filename, MODEL_MAGIC, MODEL_VERSION)
+        forest = cls(meta['className'], meta['features'], meta['numeric'],
+                     meta['categories'], meta['classes'])
+        for name in MODEL_ARRAYS:
+            setattr(forest, name, arrays[name])
+        return forest
+
+    def index(self, labels, label):
+        """
+        Returns the position of 'label' in 'labels', appending it if it is new.
+        """
+        if label not in labels:
+            labels.append(label)
+        return labels.index(label)
+
+    def addNode(self):
+        self.feature.append(-1)
+        self.threshold.append(0.0)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.value.append(-1)
+        self.catStart.append(0)
+        self.catCount.append(0)
+        self.fallback.append(-1)
+        return len(self.feature) - 1
+
+    def addTree(self, tree):
+        """
+        Appends the nodes of a trained tree, one level at a time.
+        """
+        self.roots.append(self.addNode())
+        level = [(tree.root, self.roots[-1])]
+        while len(level) > 0:
+            nextLevel = []
+            for node, nodeId in level:
+                if node.leaf:
+                    self.value[nodeId] = self.index(self.classes, node.guess)
+                    continue
+
+                featureId = self.index(self.features, node.attribute)
+                if featureId == len(self.numeric):
+                    self.numeric.append(node.numeric is not None)
+                self.feature[nodeId] = featureId
+                if node.numeric is not None:
+                    # Numeric attribute, children 0 (<=) and 1 (>)
+                    self.threshold[nodeId] = node.numeric
+                    self.left[nodeId] = self.addNode()
+                    self.right[nodeId] = self.addNode()
+                    nextLevel.append((node.children[0], self.left[nodeId]))
+                    nextLevel.append((node.children[1], self.right[nodeId]))
+                else:
+                    # Categoric attribute, one child per value
+                    labels = self.categories.setdefault(node.attribute, [])
+                    self.catStart[nodeId] = len(self.catValue)
+                    self.catCount[nodeId] = len(node.children)
+                    for key in node.children:
+                        childId = self.addNode()
+                        self.catValue.append(self.index(labels, key))
+                        self.catChild.append(childId)
+                        nextLevel.append((node.children[key], childId))
+                        if key == node.fallback:
+                            self.fallback[nodeId] = childId
+                    if self.fallback[nodeId] < 0:
+                        self.fallback[nodeId] = self.catChild[self.catStart[nodeId]]
+            level = nextLevel
+
+    def featureColumns(self, data):
+        """
+        Reads the columns of every feature from 'data'. Numeric features are read as
+        floats and categoric ones as indexes of self.categories (-1 when unknown).
+        """
+        columns = []
+        for featureId, attr in enumerate(self.features):
+            if attr not in data.table.columns:
+                raise ValueError("Attr '{}' does not exist in the dictionary".format(attr))
+            if self.numeric[featureId]:
+                if data.isNumeric(attr):
+                    columns.append(list(data.column(attr)))
+                else:
+                    labels = data.table.labels[attr]
+                    columns.append([float(labels[code]) for code in data.column(attr)])
+            else:
+                if data.isNumeric(attr):
+                    raise ValueError("Attr '{}' is categoric but numeric in the data".format(attr))
+                positions = {label: i for i, label in enumerate(self.categories.get(attr, []))}
+                mapping = [positions.get(label, -1) for label in data.table.labels[attr]]
+                columns.append([mapping[code] for code in data.column(attr)])
+        return columns
+
+    def predictTrees(self, data, numTrees=None):
+        """
+        Routes every instance of 'data' (a Data or Table) through each tree, moving all
+        instances that reach a node to its children at once, level by level.
+        :param numTrees: only use the first 'numTrees' trees
+        :returns: list with an array of class indexes for each tree
+        """
+        if isinstance(data, Table):
+            data = Data(data.className, data.numericAttr, table=data)
+        columns = self.featureColumns(data)
+        n = data.size()
+
+        predictions = []
+        for root in self.roots[:numTrees]:
+            # -1 until a leaf is reached, so a row missed by the routing can't pass for
+            # the first class
+            prediction = array('i', [-1])*n
+            level = [(root, list(range(n)))]
+            while len(level) > 0:
+                nextLevel = []
+                for nodeId, rows in level:
+                    featureId = self.feature[nodeId]
+                    if featureId < 0:
+                        # Leaf node
+                        value = self.value[nodeId]
+                        for row in rows:
+                            prediction[row] = value
+                        continue
+
+                    column = columns[featureId]
+                    if self.numeric[featureId]:
+                        threshold = self.threshold[nodeId]
+                        lower = [row for row in rows if column[row] <= threshold]
+                        # NaN goes to the higher part, as in DecisionTree.classify
+                        higher = [row for row in rows if not column[row] <= threshold]
+                        if len(lower) > 0:
+                            nextLevel.append((self.left[nodeId], lower))
+                        if len(higher) > 0:
+                            nextLevel.append((self.right[nodeId], higher))
+                    else:
+                        start = self.catStart[nodeId]
+                        end = start + self.catCount[nodeId]
+                        children = dict(zip(self.catValue[start:end], self.catChild[start:end]))
+                        fallback = self.fallback[nodeId]
+                        groups = {}
+                        for row in rows:
+                            child = children.get(column[row], fallback)
+                            if child not in groups:
+                                groups[child] = []
+                            groups[child].append(row)
+                        nextLevel.extend(groups.items())
+                level = nextLevel
+            if -1 in prediction:
+                raise ValueError("Some instances didn't reach a leaf of tree {}".format(
+                    len(predictions)))
+            predictions.append(prediction)
+
+        return predictions
+
+    def voteCounts(self, predictions, counts=None):
+        """
+        Counts the votes of the trees into an (instances x classes) matrix, stored by
+        rows in a single array.
+        :param predictions: list returned by predictTrees, or a slice of it
+        :param counts: matrix the votes are added to, a new one when not supplied
+        :returns: array with the number of votes of class c for instance i at
+                  i*len(self.classes) + c
+        """
+        numClasses = len(self.classes)
+        if counts is None:
+            n = len(predictions[0]) if len(predictions) > 0 else 0
+            counts = array('i', [0])*(n*numClasses)
+        size = len(counts)
+        for prediction in predictions:
+            for position, vote in zip(range(0, size, numClasses), prediction):
+                counts[position + vote] += 1
+        return counts
+
+    def scoreCsv(self, inFile, outFile, delimiter=',', quotechar='"', chunkSize=10000,
+                 votes=False):
+        """
+        Classifies the instances of an open CSV file 'chunkSize' rows at a time and
+        writes one prediction per line to 'outFile', so memory use doesn't depend on the
+        size of the file. The class column is not needed in the input.
+        :param votes: also write the number of votes for each class, as CSV with a header
+        :returns: dictionary with the number of rows classified, the time it took and the
+                  number of rows classified per second
+        """
+        start = time.perf_counter()
+        numeric = [attr for attr, isNumeric in zip(self.features, self.numeric) if isNumeric]
+        writer = csv.writer(outFile, lineterminator='\n')
+        if votes:
+            writer.writerow([self.className] + self.classes)
+
+        numRows = 0
+        for header, rows in readCsv(inFile, delimiter, quotechar, chunkSize):
+            chunk = Table(self.className, numeric)
+            chunk.appendChunk(header, rows)
+            counts = self.voteCounts(self.predictTrees(chunk))
+            labels = self.majorityVote(counts)
+            if votes:
+                numClasses = len(self.classes)
+                writer.writerows([label] + counts[i*numClasses:(i + 1)*numClasses].tolist()
+                                 for i, label in enumerate(labels))
+            else:
+                outFile.writelines("{}\n".format(label) for label in labels)
+            numRows += len(rows)
+
+        seconds = time.perf_counter() - start
+        return {'rows': numRows, 'seconds': seconds,
+                'rowsPerSecond': numRows/seconds if seconds > 0 else 0.0}
+
+    def predictBatch(self, data, numTrees=None):
+        """
+        Classifies every instance of 'data' (a Data or Table) by majority vote of the
+        trees. Ties go to the class that comes first in self.classes.
+        :param numTrees: only use the first 'numTrees' trees
+        :returns: list with the predicted class of each instance
+        """
+        return self.majorityVote(self.voteCounts(self.predictTrees(data, numTrees)))
+
+    def predictProbabilities(self, data, numTrees=None):
+        """
+        Returns the fraction of the trees voting for each class, in the order of
+        self.classes, for every instance of 'data' (a Data or Table).
+        :param numTrees: only use the first 'numTrees' trees
+        """
+        counts = self.voteCounts(self.predictTrees(data, numTrees))
+        return self.voteFractions(counts)
+
+    def majorityVote(self, counts):
+        """
+        Returns the class with most votes for each instance, ties going to the class
+        that comes first in self.classes.
+        :param counts: matrix returned by voteCounts
+        """
+        numClasses = len(self.classes)
+        results = []
+        for start in range(0, len(counts), numClasses):
+            row = counts[start:start + numClasses]
+            results.append(self.classes[row.index(max(row))])
+        return results
+
+    def voteFractions(self, counts):
+        """
+        Divides the votes of each instance by the number of trees that voted.
+        :param counts: matrix returned by voteCounts
+        :returns: list with the fraction of votes of every class for each instance
+        """
+        numClasses = len(self.classes)
+        numTrees = sum(counts[:numClasses]) if len(counts) > 0 else 0
+        return [[count/numTrees for count in counts[start:start + numClasses]]
+                for start in range(0, len(counts), numClasses)]
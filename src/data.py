@@ -1,15 +1,127 @@
-import csv
+import hashlib
+import json
+import logging
+import os
 import random
+import time
+from array import array
+from itertools import repeat
 from math import floor
+from operator import add, le, not_, sub
+from impurity import evaluateSplits, scaledImpurity
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Sequence
+from table import Table, readCsv
+
+logger = logging.getLogger(__name__)
+
+
+def deriveSeed(seed, *keys):
+    """
+    Derives a new seed from 'seed' and 'keys', giving independent and reproducible
+    random streams to each tree or fold.
+    """
+    return random.Random('-'.join(str(x) for x in (seed,) + keys)).getrandbits(64)
+
+
+def higherValues(values, threshold):
+    """
+    Tells whether each numeric value goes to the higher part of a split at 'threshold'.
+    Every value that is not <= threshold does, NaN included, as in DecisionTree.classify
+    and CompiledForest.predictTrees.
+    :returns: iterator with True for the values in the higher part
+    """
+    return map(not_, map(le, values, repeat(threshold)))
+
+
+def levelContingencyTables(tasks):
+    """
+    Counts the instances of every (class, value) pair for several (Data, attribute)
+    pairs over the same table, as Data.contingencyTable does, reading each value once
+    and counting all of them in a single pass. Numeric attributes are split at the
+    mean of their Data object, their values are then False (<= mean) and True (> mean)
+    as in Data.summarizeNumeric. The class codes of a Data object are read once for all
+    of its attributes.
+    :param tasks: list of (Data, attribute) tuples
+    :returns: tuple with the list of Counters and the list of means (None for
+              categoric attributes), in the order of 'tasks'
+    """
+    # Class code, value and task position of every instance of every task
+    classCodes = array('i')
+    values = []
+    positions = array('i')
+    partClasses = {}
+    means = []
+    for position, (part, attr) in enumerate(tasks):
+        classes = partClasses.get(id(part))
+        if classes is None:
+            classes = partClasses[id(part)] = array('i', part.column(part.className))
+        classCodes.extend(classes)
+        column = part.column(attr)
+        if part.isNumeric(attr):
+            column = list(column)
+            mean = sum(column)/float(part.size())
+            column = higherValues(column, mean)
+        else:
+            mean = None
+        values.extend(column)
+        positions.extend(array('i', [position])*part.size())
+        means.append(mean)
+
+    # The instances of each task are together, so the pairs of each task keep their order
+    counts = [Counter() for task in tasks]
+    for (position, classCode, value), count in Counter(zip(positions, classCodes, values)).items():
+        counts[position][(classCode, value)] = count
+    return counts, means
+
+
+class Rows(Sequence):
+    """
+    Read-only sequence over the rows of a Table, optionally restricted to 'indices' and
+    'keys'. Rows are decoded into dictionaries on first access and cached, so repeated
+    accesses return the same object.
+    """
+
+    def __init__(self, table, indices=None, keys=None):
+        self.table = table
+        self.indices = indices
+        self.keys = keys
+        self.cache = None
+
+    def __len__(self):
+        if self.indices is None:
+            return len(self.table)
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("Row index out of range")
+        if self.cache is None:
+            self.cache = [None]*len(self)
+        if self.cache[index] is None:
+            row = index if self.indices is None else self.indices[index]
+            self.cache[index] = self.table.row(row, self.keys)
+        return self.cache[index]
+
+    def copy(self):
+        return list(self)
 
 
 class Data(object):
 
-    def __init__(self, className, numeric=[]):
+    def __init__(self, className, numeric=[], table=None, indices=None, consumed=frozenset()):
+        """
+        :param table: columnar storage shared with other Data objects, a new one is
+                      created when not supplied
+        :param indices: rows of 'table' seen by this object, all rows when None
+        :param consumed: attributes hidden from this object, used by splits
+        """
         self.className = className
-        self.keys = []
-        self.instances = []
-        self.attributes = []
         if isinstance(numeric, list):
             self.numericAttr = numeric
         elif isinstance(numeric, str):
@@ -17,26 +129,79 @@ class Data(object):
         else:
             raise ValueError("Attribute 'numeric' should be a list or str")
 
-        self.numericAttr = numeric
+        # Columnar storage holding every instance
+        self.table = table if table is not None else Table(className, self.numericAttr)
+        self.indices = indices
+        self.consumed = frozenset(consumed)
+        self.keys = [x for x in self.table.keys if x not in self.consumed]
+        self.attributes = [x for x in self.table.attributes if x not in self.consumed]
+        self.rows = None
+        self.histogram = None
+        # attr -> class count of every bin, see binHistogram
+        self.binHistograms = {}
+        # (parent, siblings) for the largest part of a split, see binHistogram
+        self.derivedFrom = None
+        # Table rows the bins of numeric attributes are computed from, all of them when
+        # None. Views keep the rows of the object they come from, see binned
+        self.binRows = None
 
     def __repr__(self):
         return "<Data {} -> {}>".format(self.attributes, self.className)
 
-    def addInstance(self, newInstance):
+    @property
+    def instances(self):
+        if self.rows is None or len(self.rows) != self.size():
+            keys = self.keys if self.consumed else None
+            self.rows = Rows(self.table, self.indices, keys)
+        return self.rows
 
-        if len(self.instances) == 0:
-            # First instance
-            [self.keys.append(x) for x in newInstance.keys()]
+    def size(self):
+        """
+        Returns the number of instances seen by this object.
+        """
+        if self.indices is None:
+            return len(self.table)
+        return len(self.indices)
 
-            for x in newInstance.keys():
-                if x != self.className:
-                    self.attributes.append(x)
+    def column(self, attr):
+        """
+        Returns an iterable over the stored values of 'attr' (floats for numeric
+        attributes, codes otherwise) for the instances seen by this object.
+        """
+        column = self.table.columns[attr]
+        if self.indices is None:
+            return column
+        return map(column.__getitem__, self.indices)
 
-        elif self.instances[-1].keys() != newInstance.keys():
-            # Validate keys
-            raise ValueError("Keys for new instance '{}' don`t match previous instances".format(newInstance))
+    def view(self, indices, consumed=frozenset()):
+        """
+        Returns a Data object sharing this object's table, restricted to the table rows
+        in 'indices' and without the 'consumed' attributes.
+        """
+        data = Data(self.className, numeric=self.numericAttr, table=self.table,
+                    indices=indices, consumed=self.consumed | frozenset(consumed))
+        data.binRows = self.binRows
+        return data
 
-        self.instances.append(newInstance)
+    def __getstate__(self):
+        # Decoded rows are only a cache, don't send them to other processes
+        state = self.__dict__.copy()
+        state['rows'] = None
+        return state
+
+    def addInstance(self, newInstance):
+
+        if self.indices is not None:
+            raise ValueError("Cannot add instances to a view of another Data object")
+
+        isFirst = len(self.table) == 0 and len(self.table.keys) == 0
+        self.table.appendRow(newInstance)
+        self.histogram = None
+        self.binHistograms = {}
+        if isFirst:
+            # First instance
+            self.keys = list(self.table.keys)
+            self.attributes = list(self.table.attributes)
 
     def summarize(self, attr, class_restriction=False):
         """
@@ -52,55 +217,19 @@ class Data(object):
         #  ['Verdadeiro', 0, 0, 0],
         #  [0, sum, sum, sum]]
 
-        # Initialize the matrix
-        m = []
-        m.append(self.listAttributeValues(attr))
-        numValues = len(self.listAttributeValues(attr))
-        m[0].insert(0, 0)
-        for val in self.listClassValues():
-            newRow = [0]*numValues
-            newRow.insert(0, val)
-            m.append(newRow)
-
-        # Summarize every instance
-        for entry in self.instances:
-            # Calculate matrix positions
-            colInd = rowInd = -1
-            # Iterate over the columns (possible values)
-            for col in range(1, len(m[0])):
-                if entry[attr] == m[0][col]:
-                    # Found column with the same attribute value
-                    colInd = col
-
-            # Iterate over the rows (classes)
-            for row in range(1, len(m)):
-                if m[row][0] == entry[self.className]:
-                    # Found row
-                    rowInd = row
-
-            if rowInd >= 0 and colInd >= 0:
-                # Position was Found
-                # print("Entry: {} - {}".format(entry[attr], entry[self.className]))
-                # print("Incrementing position: [{}, {}]".format(rowInd, colInd))
-                m[rowInd][colInd] += 1
-                # print("New matrix: {}".format(m))
-            else:
-                raise ValueError("Error finding position in matrix: col: {}, row: {}".format(colInd, rowInd))
-
-        # Calculate the number of occurances for each value
-        sumRow = [0]*len(m[0])
-        for row in range(1, len(m)):
-            for col in range(1, len(m[0])):
-                sumRow[col] += m[row][col]
-
-        m.append(sumRow)
-        return m
+        counts = self.contingencyTable(attr)
+        if self.isNumeric(attr):
+            labels = None
+        else:
+            labels = self.table.labels[attr]
+        return self.buildMatrix(counts, labels)
 
-    def summarizeNumeric(self, attr):
+    def summarizeNumeric(self, attr, threshold=None):
         """
         Returns a matrix which has formatted useful data used to calculate the amount of 
         information for a numeric attribute, considering it will be divided into two 
-        possible values (attr <= mean and attr > mean).
+        possible values (attr <= threshold and attr > threshold). The threshold defaults
+        to the mean value.
         """
         if attr not in self.keys:
             raise ValueError("Attr '{}' does not exist in the dictionary".format(attr))
@@ -109,47 +238,57 @@ class Data(object):
             raise ValueError("Attr {} is not numeric".format(attr))        
 
         # Matrix format
-        # [[0, '<= mean', '> mean'],
+        # [[0, '<= threshold', '> threshold'],
         #  ['Falso', 0, 0],
         #  ['Verdadeiro', 0, 0],
         #  [0, sum, sum]]
 
-        # Calculate the mean value
-        sum = 0
-        for entry in self.instances:
-            sum += float(entry[attr])
-        mean = sum/float(len(self.instances))
-
-        # Initialize the matrix
-        m = [[0, 'lower', 'higher']]
-        for val in self.listClassValues():
-            newRow = [val, 0, 0]
-            m.append(newRow)
-
-        # Summarize every instance
-        for entry in self.instances:
-            # Calculate matrix positions
-            rowInd = -1
-            colInd = 1 if float(entry[attr]) <= mean else 2
-            # Iterate over the rows (classes)
-            for row in range(1, len(m)):
-                if m[row][0] == entry[self.className]:
-                    # Found row
-                    rowInd = row
-
-            if rowInd >= 0:
-                # Position was Found
-                m[rowInd][colInd] += 1
-            else:
-                raise ValueError("Error finding position in matrix: row: {}".
-                                 format(rowInd))
+        if threshold is None:
+            threshold = self.calculateMean(attr)
+        # False for values <= threshold, True for values > threshold
+        counts = self.contingencyTable(attr, higherValues(self.column(attr), threshold))
+        return self.buildMatrix(counts, ['lower', 'higher'], [False, True])
+
+    def contingencyTable(self, attr, values=None):
+        """
+        Counts the instances of every (class, value) pair in a single pass.
+        :param values: iterable with the value of 'attr' for each instance, the stored
+                       column (floats or codes) is used when not supplied
+        :returns: Counter mapping (class code, value) pairs to their number of instances,
+                  with the pairs in order of first appearance
+        """
+        if values is None:
+            values = self.column(attr)
+        return Counter(zip(self.column(self.className), values))
+
+    def buildMatrix(self, counts, labels=None, values=None):
+        """
+        Builds the matrix returned by summarize from a contingency table.
+        :param counts: Counter returned by contingencyTable
+        :param labels: labels for the values, indexed by value. The values themselves
+                       are used when not supplied
+        :param values: values to use as columns, in order. Defaults to the values found
+                       in 'counts' in order of first appearance
+        """
+        if values is None:
+            values = list(dict.fromkeys(value for (classCode, value) in counts))
+        classCodes = list(dict.fromkeys(classCode for (classCode, value) in counts))
+        classLabels = self.table.labels[self.className]
+
+        m = []
+        if labels is None:
+            m.append([0] + values)
+        else:
+            m.append([0] + [labels[value] for value in values])
+        for classCode in classCodes:
+            m.append([classLabels[classCode]] + [counts[(classCode, value)] for value in values])
 
         # Calculate the number of occurances for each value
         sumRow = [0]*len(m[0])
         for row in range(1, len(m)):
             for col in range(1, len(m[0])):
                 sumRow[col] += m[row][col]
-        
+
         m.append(sumRow)
         return m
 
@@ -158,63 +297,149 @@ class Data(object):
         Returns a list contaning all the possible value labels for a given
         attribute.
         """
-        valueList = []
-        for row in self.instances:
-            if row[attr] not in valueList:
-                valueList.append(row[attr])
-        return valueList
+        if self.table.isNumeric(attr):
+            return list(dict.fromkeys(self.column(attr)))
+        return self.listLabels(attr)
 
     def listClassValues(self):
         """
         Returns a list containing all the possible class values
         """
-        classList = []
-        for row in self.instances:
-            if row[self.className] not in classList:
-                classList.append(row[self.className])
-        return classList
+        return self.listLabels(self.className)
 
-    def parseFromFile(self, filename, delimiter, quotechar):
+    def listLabels(self, attr):
+        """
+        Returns the labels of a categoric attribute in order of first appearance.
+        """
+        labels = self.table.labels[attr]
+        if attr == self.className:
+            return [labels[code] for code in self.classHistogram()]
+        return [labels[code] for code in dict.fromkeys(self.column(attr))]
 
-        reader = csv.DictReader(open(filename, mode='r'), delimiter=delimiter, 
-                                quotechar=quotechar)
-        for row in reader:
-            # row is an OrderedDict by default
-            self.addInstance(dict(row))
+    def parseFromFile(self, filename, delimiter, quotechar, chunkSize=10000, cache=False):
+        """
+        Reads the instances of a CSV file 'chunkSize' rows at a time, parsing each chunk
+        straight into the columns of the table, so only one chunk of raw values is kept
+        in memory.
+        :param cache: when the Data object is empty, memory-map the table from a binary
+                      file next to the CSV file instead of parsing it. The binary file is
+                      written on the first load and rebuilt whenever the CSV file or the
+                      parsing options change
+        :returns: dictionary with the number of rows read, the time it took, the number
+                  of rows read per second and whether they came from the cache
+        """
+        if self.indices is not None:
+            raise ValueError("Cannot add instances to a view of another Data object")
+
+        start = time.perf_counter()
+        cached = False
+        useCache = cache and len(self.table) == 0 and len(self.table.keys) == 0
+        if useCache:
+            cacheFile, key = self.cacheKey(filename, delimiter, quotechar)
+            cached = self.loadCache(cacheFile, key)
+
+        if cached:
+            numRows = len(self.table)
+        else:
+            numRows = 0
+            with open(filename, mode='r', newline='') as csvFile:
+                for header, rows in readCsv(csvFile, delimiter, quotechar, chunkSize):
+                    self.table.appendChunk(header, rows)
+                    numRows += len(rows)
+            if useCache:
+                self.saveCache(cacheFile, key)
+
+        self.keys = list(self.table.keys)
+        self.attributes = list(self.table.attributes)
+        self.histogram = None
+        self.binHistograms = {}
+
+        seconds = time.perf_counter() - start
+        stats = {'rows': numRows, 'seconds': seconds,
+                 'rowsPerSecond': numRows/seconds if seconds > 0 else 0.0, 'cached': cached}
+        logger.info("Read {} rows from '{}'{} in {:.3f}s ({:.0f} rows/s)".format(
+            numRows, filename, " (cached)" if cached else "", seconds, stats['rowsPerSecond']))
+        return stats
+
+    def cacheKey(self, filename, delimiter, quotechar):
+        """
+        Returns the name of the binary cache for a CSV file and the dictionary that must
+        match the one stored in it for the cache to be used.
+        """
+        path = os.path.abspath(filename)
+        status = os.stat(path)
+        key = {'path': path, 'mtime': status.st_mtime_ns, 'size': status.st_size,
+               'delimiter': delimiter, 'quotechar': quotechar, 'className': self.className,
+               'numeric': sorted(self.numericAttr)}
+        # Different parsing options of the same file get different caches
+        options = json.dumps([delimiter, quotechar, self.className, key['numeric']])
+        digest = hashlib.sha1(options.encode('utf-8')).hexdigest()[:12]
+        return "{}.{}.tblcache".format(path, digest), key
+
+    def loadCache(self, cacheFile, key):
+        """
+        Replaces the table with the one in 'cacheFile' if it exists and was built with
+        'key'.
+        :returns: True if the cache was used
+        """
+        if not os.path.exists(cacheFile):
+            return False
+        try:
+            table, storedKey = Table.load(cacheFile)
+        except (ValueError, KeyError, OSError) as error:
+            logger.warning("Ignoring cache '{}': {}".format(cacheFile, error))
+            return False
+        if storedKey != key:
+            return False
+
+        self.table = table
+        return True
+
+    def saveCache(self, cacheFile, key):
+        """
+        Writes the table to 'cacheFile', replacing it atomically.
+        """
+        tempFile = "{}.{}.tmp".format(cacheFile, os.getpid())
+        try:
+            self.table.save(tempFile, key)
+            os.replace(tempFile, cacheFile)
+        except OSError as error:
+            logger.warning("Could not write cache '{}': {}".format(cacheFile, error))
+            if os.path.exists(tempFile):
+                os.remove(tempFile)
 
     def uniformClass(self):
         """
         Checks if there is more than one class value in the dataset.
         :returns: True if data is uniform, False otherwise
         """
-        value = self.instances[0][self.className]
-        for entry in self.instances:
-            if entry[self.className] != value:
-                return False
-
-        return True
+        return len(self.classHistogram()) <= 1
 
     def mostFrequentClass(self):
         """
         Returns the most frequent value for the dataset class.
         """
-        if len(self.instances) == 0:
+        if self.isEmpty():
             raise ValueError("Data object has no instances, cannot find most frequent\
                              class")
-        # Count the number of occurances
-        countDic = {}
-        for entry in self.instances:
-            if entry[self.className] in countDic.keys():
-                countDic[entry[self.className]] += 1
-            else:
-                countDic[entry[self.className]] = 1
         # Find highest
-        highest = ("", 0)
-        for key in countDic:
-            if countDic[key] > highest[1]:
-                highest = (key, countDic[key])
+        countDic = self.classHistogram()
+        highest = (-1, 0)
+        for code in countDic:
+            if countDic[code] > highest[1]:
+                highest = (code, countDic[code])
         
-        return highest[0]
+        return self.table.labels[self.className][highest[0]]
+
+    def classHistogram(self):
+        """
+        Returns a dictionary mapping each class code to its number of instances, in order
+        of first appearance. It is computed once and cached, splits hand each part its
+        share of this object's histogram.
+        """
+        if self.histogram is None:
+            self.histogram = dict(Counter(self.column(self.className)))
+        return self.histogram
 
     def calculateMean(self, attrName):
         """
@@ -223,152 +448,326 @@ class Data(object):
         if not self.isNumeric(attrName):
             raise SystemError("Attribute '{}' is not numeric.".format(attrName))
             
-        # Calculate the mean value
-        sum = 0
-        for entry in self.instances:
-            sum += float(entry[attrName])
-        mean = sum/float(len(self.instances))
-        return mean
+        return sum(self.column(attrName))/float(self.size())
 
-    def split(self, attrName):
+    def bestThreshold(self, attrName, criterion='entropy', minSamplesLeaf=1):
+        """
+        Finds the threshold for a numeric attribute which leaves the least class
+        information in the two resulting parts (values <= threshold and values >
+        threshold). The values are sorted once and the class counts of each part are
+        updated while sweeping over them, so the search is O(n log n).
+        :param criterion: impurity measuring the information, see impurity.CRITERIA
+        :param minSamplesLeaf: thresholds leaving fewer instances in a part are skipped
+        :returns: the threshold, or None if all instances have the same value or no
+                  threshold leaves enough instances in both parts
+        """
+        if not self.isNumeric(attrName):
+            raise SystemError("Attribute '{}' is not numeric.".format(attrName))
+
+        pairs = sorted(zip(self.column(attrName), self.column(self.className)))
+        n = len(pairs)
+        lower = [0]*len(self.table.labels[self.className])
+        higher = lower.copy()
+        for code, count in self.classHistogram().items():
+            higher[code] = count
+
+        best = (None, 0)
+        for i in range(n - 1):
+            value, code = pairs[i]
+            lower[code] += 1
+            higher[code] -= 1
+            nextValue = pairs[i + 1][0]
+            if nextValue == value:
+                # Not a boundary between two values
+                continue
+            if i + 1 < minSamplesLeaf or n - i - 1 < minSamplesLeaf:
+                # Too few instances in a part
+                continue
+
+            # Class information of both parts weighted by their sizes (times n)
+            info = (scaledImpurity(lower, i + 1, criterion) +
+                    scaledImpurity(higher, n - i - 1, criterion))
+            if best[0] is None or info < best[1]:
+                # Cut halfway between the two values
+                threshold = value + (nextValue - value)/2
+                best = (threshold if threshold < nextValue else value, info)
+
+        return best[0]
+
+    def binned(self, attr):
+        """
+        Returns the bins of a numeric attribute computed from the rows in self.binRows,
+        see Table.binned.
+        """
+        return self.table.binned(attr, self.binRows)
+
+    def binHistogram(self, attr):
+        """
+        Returns the class counts of every bin of a numeric attribute as a flat list,
+        where the count for bin b and class code c is at b*numClasses + c. When this
+        object is the largest part of a split whose parent already has the histogram,
+        it is found by subtracting the siblings' histograms from the parent's instead
+        of counting the rows again. It is computed once and cached.
+        """
+        histogram = self.binHistograms.get(attr)
+        if histogram is not None:
+            return histogram
+
+        numClasses = len(self.table.labels[self.className])
+        if self.derivedFrom is not None and attr in self.derivedFrom[0].binHistograms:
+            parent, siblings = self.derivedFrom
+            histogram = parent.binHistograms[attr]
+            for sibling in siblings:
+                histogram = [x - y for x, y in zip(histogram, sibling.binHistogram(attr))]
+        else:
+            codes, edges = self.binned(attr)
+            if self.indices is None:
+                bins = codes
+            else:
+                bins = map(codes.__getitem__, self.indices)
+            histogram = [0]*(len(edges)*numClasses)
+            for (binCode, classCode), count in Counter(zip(bins, self.column(self.className))).items():
+                histogram[binCode*numClasses + classCode] = count
+
+        self.binHistograms[attr] = histogram
+        return histogram
+
+    def summarizeBins(self, attr, threshold):
+        """
+        Same as summarizeNumeric, but built from the bin histogram of the attribute, so
+        'threshold' must be one of its bin edges.
+        """
+        if not self.isNumeric(attr):
+            raise ValueError("Attr {} is not numeric".format(attr))
+
+        edges = self.binned(attr)[1]
+        histogram = self.binHistogram(attr)
+        numClasses = len(self.table.labels[self.className])
+        limit = (bisect_left(edges, threshold) + 1)*numClasses
+        counts = Counter()
+        for code in self.classHistogram():
+            counts[(code, False)] = sum(histogram[code:limit:numClasses])
+            counts[(code, True)] = sum(histogram[limit + code::numClasses])
+        return self.buildMatrix(counts, ['lower', 'higher'], [False, True])
+
+    def bestBinThreshold(self, attrName, criterion='entropy', minSamplesLeaf=1):
+        """
+        Same as bestThreshold, but only considers the upper edges of the bins of the
+        attribute as thresholds. The search is done over the bin histogram, so its cost
+        depends on the number of bins instead of the number of instances, and every
+        edge is evaluated at once by the impurity kernel.
+        :param minSamplesLeaf: edges leaving fewer instances in a part are skipped
+        :returns: the threshold, or None if all instances fall into the same bin or no
+                  edge leaves enough instances in both parts
+        """
+        if not self.isNumeric(attrName):
+            raise SystemError("Attribute '{}' is not numeric.".format(attrName))
+
+        edges = self.binned(attrName)[1]
+        histogram = self.binHistogram(attrName)
+        numClasses = len(self.table.labels[self.className])
+        n = self.size()
+        lower = [0]*numClasses
+        higher = lower.copy()
+        for code, count in self.classHistogram().items():
+            higher[code] = count
+        parent = higher
+
+        # Class counts of both parts for each edge between non-empty bins
+        thresholds = []
+        splits = []
+        numLower = 0
+        for b in range(len(edges) - 1):
+            binCounts = histogram[b*numClasses:(b + 1)*numClasses]
+            binSize = sum(binCounts)
+            if binSize == 0:
+                continue
+            lower = list(map(add, lower, binCounts))
+            higher = list(map(sub, higher, binCounts))
+            numLower += binSize
+            if n - numLower < max(minSamplesLeaf, 1):
+                # Too few instances left for the higher part
+                break
+            if numLower < minSamplesLeaf:
+                continue
+            thresholds.append(edges[b])
+            splits.append((lower, higher))
+
+        if len(splits) == 0:
+            return None
+        infos = [info for info, gain in evaluateSplits(parent, splits, criterion)]
+        return thresholds[infos.index(min(infos))]
+
+    def split(self, attrName, threshold=None, consume=True):
         """
         Splits the data into however Data objecst is dictated by the number of values for 
         the specified attribute name. And deletes all the values correponding to the 
-        specified attribute from the returned instances.
+        specified attribute from the returned instances, unless 'consume' is False.
+        Numeric attributes are split at 'threshold', which defaults to the mean value.
         :returns: dictionary containing the values as keys and Data instances as values
         """
-        splitDic = {}
+        rows = self.indices if self.indices is not None else range(self.size())
         if self.isNumeric(attrName):
-            # Split for numeric values
-            splitDic[0] = Data(self.className, numeric=self.numericAttr)
-            splitDic[1] = Data(self.className, numeric=self.numericAttr)
-            mean = self.calculateMean(attrName)
-            for entry in self.instances:
-                newEntry = entry.copy()
-                del newEntry[attrName]
-                if float(entry[attrName]) <= mean:
-                    splitDic[0].addInstance(newEntry)
-                else:
-                    splitDic[1].addInstance(newEntry)
+            # Split for numeric values, False for values <= threshold and True otherwise
+            if threshold is None:
+                threshold = self.calculateMean(attrName)
+            values = list(higherValues(self.column(attrName), threshold))
+            groups = {False: array('i'), True: array('i')}
+            keys = {False: 0, True: 1}
         else:
             # Split for categoric values
-            for entry in self.instances:
-                newEntry = entry.copy()
-                del newEntry[attrName]
-                if entry[attrName] not in splitDic.keys():
-                    # Create a new Data instance
-                    newData = Data(self.className, numeric=self.numericAttr)
-                    splitDic[entry[attrName]] = newData
+            values = list(self.column(attrName))
+            groups = {}
+            keys = self.table.labels[attrName]
 
-                splitDic[entry[attrName]].addInstance(newEntry)
+        for row, value in zip(rows, values):
+            if value not in groups:
+                groups[value] = array('i')
+            groups[value].append(row)
 
+        # The class histogram of each part comes from the contingency table
+        histograms = {value: {} for value in groups}
+        for (classCode, value), count in self.contingencyTable(attrName, values).items():
+            histograms[value][classCode] = count
 
+        # Each part is a view over the same table without the split attribute
+        splitDic = {}
+        for value in groups:
+            splitDic[keys[value]] = self.view(groups[value], consumed=[attrName] if consume else [])
+            splitDic[keys[value]].histogram = histograms[value]
+
+        # The largest part can derive its bin histograms from the other parts
+        parts = list(splitDic.values())
+        largest = max(parts, key=Data.size)
+        largest.derivedFrom = (self, [x for x in parts if x is not largest])
 
         return splitDic
 
-    def generateFolds(self, k=1, discardExtras=False):
+    def classRows(self):
+        """
+        Returns a dictionary mapping each class code to an array with the table rows of
+        its instances, in order of first appearance.
+        """
+        groups = {}
+        rows = self.indices if self.indices is not None else range(self.size())
+        for row, code in zip(rows, self.column(self.className)):
+            if code not in groups:
+                groups[code] = array('i')
+            groups[code].append(row)
+        return groups
+
+    def bootstrap(self, rng):
+        """
+        Draws a bootstrap of table rows with the random generator 'rng'.
+        :returns: tuple with an array of the rows drawn with repetition and an array of
+                  the rows left out of it
+        """
+        rows = self.indices if self.indices is not None else range(self.size())
+        drawn = array('i', [rows[rng.randrange(len(rows))] for j in range(len(rows))])
+        return drawn, self.outOfBag(drawn)
+
+    def stratifiedBootstrap(self, rng, groups=None):
+        """
+        Draws a stratified bootstrap of table rows with the random generator 'rng'.
+        :param groups: result of classRows, computed when not supplied
+        :returns: tuple with an array of the rows drawn with repetition and an array of
+                  the rows left out of it
+        """
+        if groups is None:
+            groups = self.classRows()
+
+        drawn = array('i')
+        for rows in groups.values():
+            drawn.extend([rows[rng.randrange(len(rows))] for j in range(len(rows))])
+        return drawn, self.outOfBag(drawn)
+
+    def outOfBag(self, drawn):
+        """
+        Returns an array with the table rows of this object missing from 'drawn', using
+        a mask over the table instead of membership tests.
+        """
+        mask = bytearray(len(self.table))
+        for row in drawn:
+            mask[row] = 1
+        rows = self.indices if self.indices is not None else range(self.size())
+        return array('i', [row for row in rows if not mask[row]])
+
+    def generateFolds(self, k=1, discardExtras=False, rng=None):
         '''
-        Generates 'k' sets of instances without repetition.
+        Generates 'k' sets of instances without repetition from a shuffled permutation of the table rows, drawn with 'rng' (a random.Random, the random module when not supplied).
         WARNING: setting 'discardExtras' to False will cause folds to have different sizes if the number of instances isn't divisible by 'k'.
-        Returns the list of folds.
+        Returns the list of folds, each an array of table rows, see view.
         '''
+        if rng is None:
+            rng = random
 
-        instancesCopy = self.instances.copy()
-        folds = []
-        for i in range(k):
-            folds.append([])    #New fold
-
-            #Adds 'instances/k' (rounded down) random instances to each fold
-            for j in range(floor(len(self.instances)/k)):
-                folds[i].append(instancesCopy.pop(random.randint(0, len(instancesCopy)-1)))
+        rows = list(self.indices if self.indices is not None else range(self.size()))
+        rng.shuffle(rows)
+        foldSize = self.size()//k
+        folds = [array('i', rows[i*foldSize:(i + 1)*foldSize]) for i in range(k)]
 
         #Evenly distributes the remaining instances. Will cause some folds to have 1 more instance than others if the number of instances isn't divisible by 'k'.
         if discardExtras == False:
-            while len(instancesCopy) != 0:
-                for i in range(k):
-                    if(len(instancesCopy) != 0):
-                        folds[i].append(instancesCopy.pop(random.randint(0, len(instancesCopy)-1)))    
+            self.distributeExtras(folds, rows[k*foldSize:])
 
         return folds
 
-    def generateStratifiedFolds(self, k=1, discardExtras=False):
+    def generateStratifiedFolds(self, k=1, discardExtras=False, rng=None):
         '''
-        Generates 'k' stratified sets of instances without repetition.
+        Generates 'k' stratified sets of instances without repetition from shuffled permutations of the table rows of each class, drawn with 'rng' (a random.Random, the random module when not supplied).
         WARNING: setting 'discardExtras' to False will cause folds to have different sizes if the number of instances isn't divisible by 'k'.
-        Returns the list of folds.
+        Returns the list of folds, each an array of table rows, see view.
         '''
-
-        classValueDistribution = {}
-        for value in self.listClassValues(): #For each possible class value
-            matchingInstances = [instance for instance in self.instances if instance[self.className] == value] #Instances that have the matching value
-            classValueDistribution[value] = len(matchingInstances)/len(self.instances)  #Percentage of instances that have this value
-
-        instancesCopy = self.instances.copy()   #Pool of instances that haven't been picked
-        folds = []
-        for i in range(k):
-            folds.append([])    #New fold
-
-            for value in self.listClassValues(): #For each possible class value
-                matchingInstances = [instance for instance in instancesCopy if instance[self.className] == value] #Instances that have the matching value
-
-                #Adds matching instances to the fold keeping the same value proportion as the full data set
-                for j in range(floor((len(self.instances)/k) * classValueDistribution[value])):
-                    selectedInstance = matchingInstances.pop(random.randint(0, len(matchingInstances)-1))   #Selects random matching instance
-                    folds[i].append(selectedInstance)   #Adds selected instance to the fold
-                    instancesCopy.remove(selectedInstance)  #Removes selected instance from the pool
+        if rng is None:
+            rng = random
+
+        folds = [array('i') for i in range(k)]
+        remaining = []  #Rows that haven't been picked
+        for rows in self.classRows().values():  #For each possible class value
+            rows = list(rows)
+            rng.shuffle(rows)
+            #Adds matching instances to each fold keeping the same value proportion as the full data set
+            foldSize = floor((self.size()/k) * (len(rows)/self.size()))
+            for i in range(k):
+                folds[i].extend(rows[i*foldSize:(i + 1)*foldSize])
+            remaining.extend(rows[k*foldSize:])
 
         #Evenly distributes the remaining instances. Will cause some folds to have 1 more instance than others if the number of instances isn't divisible by 'k'.
         if discardExtras == False:
-            while len(instancesCopy) != 0:
-                for i in range(k):
-                    if(len(instancesCopy) != 0):
-                        folds[i].append(instancesCopy.pop(random.randint(0, len(instancesCopy)-1)))
+            rng.shuffle(remaining)
+            self.distributeExtras(folds, remaining)
 
         return folds
 
-    def generateBootstraps(self, k=1):
+    def distributeExtras(self, folds, rows):
         '''
-        Randomly generates 'k' sets of instances with repetition for the training set and sets of instances that aren't in the training set for the testing set.
-        Returns the list of bootstraps.
+        Appends 'rows' to the folds one at a time, going around them in order.
         '''
-        bootstraps = []
-        for i in range(k):
-            bootstraps.append( ([], []) )   #Adds a new bootstrap. Each bootstrap is a tuple with a list of training instances (index 0) and a list of testing instances (index 1)
-
-            for j in range(len(self.instances)):    #Bootstraps have the same number of instances as the original data set
-                bootstraps[i][0].append(self.instances[random.randint(0, len(self.instances)-1)]) #Adds a random instance to the current's bootstrap training list
-
-            for j in range(len(self.instances)): #Goes through every instance again
-                if self.instances[j] not in bootstraps[i][0]:    #Checks for instances that weren't picked for the training list
-                    bootstraps[i][1].append(self.instances[j])   #Adds the instance to the testing list
+        for i, row in enumerate(rows):
+            folds[i % len(folds)].append(row)
 
-        return bootstraps
+    def generateBootstraps(self, k=1, rng=None):
+        '''
+        Randomly generates 'k' sets of instances with repetition for the training set and sets of instances that aren't in the training set for the testing set.
+        Returns the list of bootstraps. Each bootstrap is a tuple with an array of the table rows drawn for training (index 0) and an array of the rows left out for testing (index 1), see view.
+        '''
+        if rng is None:
+            rng = random
+        return [self.bootstrap(rng) for i in range(k)]
 
-    def generateStratifiedBootstraps(self, k=1):
+    def generateStratifiedBootstraps(self, k=1, rng=None):
         '''
         Generates 'k' stratfied sets of instances with repetition for the training set and sets of instances that aren't in the training set for the testing set.
-        Returns the list of bootstraps. Each bootstrap is a tuple with a list of training instances (index 0) and a list of testing instances (index 1).
+        Returns the list of bootstraps. Each bootstrap is a tuple with an array of the table rows drawn for training (index 0) and an array of the rows left out for testing (index 1), see view.
         '''
-        bootstraps = []
-        for i in range(k):  #For each bootstrap
-            bootstraps.append( ([], []) )   #Adds a new bootstrap
-
-            for value in self.listClassValues(): #For each possible class value
-                matchingInstances = [instance for instance in self.instances if instance[self.className] == value] #Instances that have the matching value
-
-                #Add to the bootstrap the same number of instances with that value that are in the data set
-                for j in range(len(matchingInstances)):
-                    bootstraps[i][0].append(matchingInstances[random.randint(0, len(matchingInstances)-1)])    #Adds a random instance from the matching instances to the training list
-
-            for j in range(len(self.instances)):    #Goes through every instance again
-                if self.instances[j] not in bootstraps[i][0]:   #Checks for instances that weren't picked for the training list
-                    bootstraps[i][1].append(self.instances[j])  #Adds the instance to the testing list
-
-        return bootstraps
+        if rng is None:
+            rng = random
+        groups = self.classRows()
+        return [self.stratifiedBootstrap(rng, groups) for i in range(k)]
 
     def isEmpty(self):
 
-        if len(self.instances) == 0:
+        if self.size() == 0:
             return True
         else:
             return False
@@ -1,144 +1,521 @@
-from math import log, sqrt
-from random import shuffle, choice
-from data import Data
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from math import sqrt
+from data import Data, deriveSeed, levelContingencyTables
+from compiled import CompiledForest
+from impurity import CRITERIA, evaluateSplits, impurity, matrixParts
+import profiling
+
+# Ways of choosing the threshold of numeric attributes
+NUMERIC_SPLITS = ('mean', 'best', 'histogram')
+
+# Dataset shared by the trees trained in a worker process, see RandomForest.generateForest
+_workerData = None
+
+
+def _initWorker(data, profile=False):
+    global _workerData
+    _workerData = data
+    if profile:
+        # Forked workers start with the records of the parent
+        profiling.reset()
+        profiling.enable()
+
+
+def _trainWorkerTree(task):
+    # Views of the dataset would pickle the whole table with every tree, the parent
+    # rebinds them to its own table. The profiling records of the worker go back with
+    # the tree
+    tree = trainTree(_workerData, *task)
+    if tree.data is not None:
+        tree.release()
+    return tree, profiling.collect() if profiling.isEnabled() else None
+
+
+def trainTree(data, trainingRows, testingRows, seed, numericSplit, lean=False,
+              options={}):
+    """
+    Trains a tree over the table rows 'trainingRows' of 'data', keeping the rows in
+    'testingRows' as its testing data.
+    :param options: stopping criteria and criterion passed to the DecisionTree, see its
+                    parameters
+    :returns: the trained DecisionTree
+    """
+    trainingData = data.view(trainingRows)
+    if numericSplit == 'histogram' and data.binRows is None:
+        # Bins come from the rows the forest trains on, never from its testing data
+        trainingData.binRows = data.indices
+    tree = DecisionTree(data=trainingData, testingData=data.view(testingRows),
+                        numericSplit=numericSplit, seed=seed, lean=lean, **options)
+    tree.train()
+    return tree
+
 
 class RandomForest(object):
 
-    def __init__(self, data, testingData):
+    def __init__(self, data, testingData, numericSplit='mean', seed=None, lean=False,
+                 maxDepth=None, minSamplesSplit=2, minSamplesLeaf=1, minInfoGain=0.0,
+                 maxLeafNodes=None, reuseNumeric=False, criterion='entropy'):
+        """
+        :param numericSplit: how trees split numeric attributes, see DecisionTree
+        :param seed: seed from which every tree derives its own, drawn from the random
+                     module when not supplied
+        :param lean: release the data of each tree once it is trained, see
+                     DecisionTree.release
+        :param maxDepth, minSamplesSplit, minSamplesLeaf, minInfoGain, maxLeafNodes,
+               reuseNumeric: stopping criteria of every tree, see DecisionTree
+        :param criterion: impurity used to select attributes, see DecisionTree
+        """
+        if numericSplit not in NUMERIC_SPLITS:
+            raise ValueError("Unknown numeric split '{}'".format(numericSplit))
+        if criterion not in CRITERIA:
+            raise ValueError("Unknown criterion '{}'".format(criterion))
         self.trees = [] #List of trees
         self.data = data
         self.testingData = testingData
-
-    def generateForest(self, numTrees=10):
+        self.numericSplit = numericSplit
+        self.seed = seed
+        self.lean = lean
+        self.treeOptions = {'maxDepth': maxDepth, 'minSamplesSplit': minSamplesSplit,
+                            'minSamplesLeaf': minSamplesLeaf, 'minInfoGain': minInfoGain,
+                            'maxLeafNodes': maxLeafNodes, 'reuseNumeric': reuseNumeric,
+                            'criterion': criterion}
+        # Votes of the trees for the training instances left out of their bootstraps,
+        # indexed by table row and class code, and the ratio of right guesses of each
+        # tree over them, see addOutOfBag
+        self.oobVotes = None
+        self.oobPerformances = []
+
+    def generateForest(self, numTrees=10, nJobs=1):
         '''
-        Generates 'numTrees' random trees trained from 'data'
+        Generates 'numTrees' random trees trained from 'data', adding them to the trees
+        already in the forest. The first trees don't depend on how many are added later,
+        so a forest grown to n trees contains every smaller forest with the same seed.
+        With 'nJobs' > 1 the trees are trained in that many worker processes, which
+        receive the dataset once and only the bootstrap rows of each tree afterwards.
+        Their trees come back without data and are given views of the forest's table,
+        their nodes keep none. Every tree uses seeds derived from the forest seed and its
+        position, so the result doesn't depend on 'nJobs'.
         '''
-        #Generates a bootstrap for each tree from the training data
-        bootstraps = self.data.generateStratifiedBootstraps(numTrees)
-
-        #Creates <Data> objects for each training set in the bootstraps
-        treeTrainingData = []
-        for i in range(numTrees):
-            treeTrainingData.append(Data(self.data.className, self.data.numericAttr))
-            for instance in bootstraps[i][0]:
-                treeTrainingData[i].addInstance(instance)
-
-        #Creates <Data> objects for each testing set in the bootstraps
-        treeTestingData = []
-        for i in range(numTrees):
-            treeTestingData.append(Data(self.data.className, self.data.numericAttr))
-            for instance in bootstraps[i][1]:
-                treeTestingData[i].addInstance(instance)
+        if self.seed is None:
+            self.seed = random.getrandbits(64)
+
+        #Draws a stratified bootstrap for each tree from the training data
+        groups = self.data.classRows()
+        tasks = []
+        for i in range(len(self.trees), len(self.trees) + numTrees):
+            rng = random.Random(deriveSeed(self.seed, 'bootstrap', i))
+            trainingRows, testingRows = self.data.stratifiedBootstrap(rng, groups)
+            tasks.append((trainingRows, testingRows, deriveSeed(self.seed, 'tree', i),
+                          self.numericSplit, self.lean, self.treeOptions))
 
         #Creates each tree and trains them
-        for i in range(numTrees):
-            self.trees.append(DecisionTree(data=treeTrainingData[i],
-                                           testingData=treeTestingData[i]))
-            self.trees[i].train()
+        if nJobs > 1:
+            with ProcessPoolExecutor(max_workers=nJobs, initializer=_initWorker,
+                                     initargs=(self.data, profiling.isEnabled())) as executor:
+                for task, (tree, records) in zip(tasks, executor.map(_trainWorkerTree, tasks)):
+                    if not self.lean:
+                        tree.data = self.data.view(task[0])
+                        tree.testingData = self.data.view(task[1])
+                    self.trees.append(tree)
+                    if records is not None:
+                        profiling.merge(records)
+        else:
+            for task in tasks:
+                self.trees.append(trainTree(self.data, *task))
+
+        for tree in self.trees[len(self.trees) - numTrees:]:
+            self.addOutOfBag(tree)
 
-    def classify(self, instance):
+    def addOutOfBag(self, tree):
+        '''
+        Adds the predictions of a newly trained tree over its out-of-bag instances to the
+        forest's out-of-bag votes.
+        '''
+        table = self.data.table
+        numClasses = len(tree.classes)
+        if self.oobVotes is None:
+            self.oobVotes = array('i', [0])*(len(table)*numClasses)
+        if tree.oobRows is None:
+            return
+
+        classColumn = table.columns[self.data.className]
+        rightGuesses = 0
+        for row, prediction in zip(tree.oobRows, tree.oobPredictions):
+            self.oobVotes[row*numClasses + prediction] += 1
+            if prediction == classColumn[row]:
+                rightGuesses += 1
+        self.oobPerformances.append(rightGuesses/len(tree.oobRows) if len(tree.oobRows) > 0 else 0.0)
+        if self.lean:
+            tree.oobRows = None
+            tree.oobPredictions = None
+
+    def outOfBagPredictions(self):
+        '''
+        Classifies each training instance by majority vote of the trees that didn't see
+        it, with the same tie-break as classify.
+        Returns a tuple with the list of table rows that were left out by at least one
+        tree and the list of predicted classes for them.
         '''
-        Classifies an instance.
+        if self.oobVotes is None:
+            if self.data is None:
+                raise AttributeError("Out-of-bag votes of the forest were released")
+            raise AttributeError("Forest not generated yet! No out-of-bag votes!")
+
+        classes = self.trees[0].classes
+        numClasses = len(classes)
+        rows = []
+        predictions = []
+        for start in range(0, len(self.oobVotes), numClasses):
+            counts = self.oobVotes[start:start + numClasses]
+            highest = max(counts)
+            if highest > 0:
+                rows.append(start//numClasses)
+                predictions.append(classes[counts.index(highest)])
+        return rows, predictions
+
+    def outOfBagScore(self):
+        '''
+        Estimates the performance of the forest from its out-of-bag votes, without
+        classifying any instance again.
+        Returns a dictionary with the accuracy, the error and the number of instances
+        the estimate is based on.
+        '''
+        rows, predictions = self.outOfBagPredictions()
+        table = self.data.table if self.data is not None else None
+        if table is None:
+            raise AttributeError("Training data of the forest was released")
+        rightGuesses = sum(1 for row, prediction in zip(rows, predictions)
+                           if table.value(self.data.className, row) == prediction)
+        accuracy = rightGuesses/len(rows) if len(rows) > 0 else 0.0
+        return {'accuracy': accuracy, 'error': 1 - accuracy, 'instances': len(rows)}
+
+    def classify(self, instance, numTrees=None):
+        '''
+        Classifies an instance by majority vote of the first 'numTrees' trees (all of
+        them when not supplied). Ties go to the class that comes first in the training
+        data.
         Returns the predicted class.
         '''
+        counts = self.voteCounts(instance, numTrees)
+        return self.trees[0].classes[counts.index(max(counts))]
+
+    def classifyProbabilities(self, instance, numTrees=None):
+        '''
+        Returns a dictionary with the fraction of the first 'numTrees' trees voting for
+        each class.
+        '''
+        counts = self.voteCounts(instance, numTrees)
+        return {label: count/sum(counts)
+                for label, count in zip(self.trees[0].classes, counts)}
 
+    def voteCounts(self, instance, numTrees=None):
+        '''
+        Returns a list with the number of the first 'numTrees' trees voting for each
+        class, in the order of the class labels of the training data.
+        '''
         if len(self.trees) == 0:
             raise AttributeError("Forest not generated yet! Can't classify!")
-            return None
-        else:
-            predictions = []
-            #Gathers the predictions of each tree
-            for tree in self.trees:
-                predictions.append(tree.classify(instance))
-
-            #Builds a dictionary with the predictions and the amount of each one
-            results = {}
-            for prediction in predictions:
-                if prediction not in results.keys():    #New entry
-                    results[prediction] = 0
 
-                results[prediction] += 1
+        classes = self.trees[0].classes
+        counts = [0]*len(classes)
+        for tree in self.trees[:numTrees]:
+            counts[classes.index(tree.classify(instance))] += 1
+        return counts
 
-            highestVoted = ("", 0)
-            #Selects the result with most votes
-            for result in results.keys():
-                if results[result] > highestVoted[1]:
-                    highestVoted = (result, results[result])
-
-            return highestVoted[0]
+    def compile(self, numTrees=None):
+        '''
+        Flattens the first 'numTrees' trained trees (all of them when not supplied) into
+        arrays, which can classify many instances at once with predictBatch.
+        Returns the CompiledForest.
+        '''
+        if len(self.trees) == 0:
+            raise AttributeError("Forest not generated yet! Can't compile!")
+        return CompiledForest.fromTrees(self.trees[:numTrees], self.trees[0].classes)
 
-    def evaluateTreesPerformance(self):
-        treePerformances = []
+    def release(self):
+        '''
+        Releases the training and testing data of the forest and of every tree, and the
+        out-of-bag votes and rows, which grow with the training table. Only what is needed to
+        classify is kept, so the footprint depends on the number of nodes. No more
+        trees can be generated afterwards.
+        '''
         for tree in self.trees:
-            predictions = []
-            for instance in tree.testingData.instances:
-                predictions.append(tree.classify(instance))
+            tree.release()
+            tree.oobRows = None
+            tree.oobPredictions = None
+        self.data = None
+        self.testingData = None
+        self.oobVotes = None
+
+    def profileReport(self):
+        '''
+        Returns a dictionary with the time, calls and rows of each training and
+        classification phase recorded by the profiling module (see profiling.enable),
+        including the trees trained in worker processes, and the structure of each tree.
+        '''
+        trees = [tree.structure() for tree in self.trees]
+        return {'phases': profiling.report(), 'trees': trees,
+                'nodes': sum(x['nodes'] for x in trees),
+                'leaves': sum(x['leaves'] for x in trees),
+                'maxDepth': max([x['depth'] for x in trees], default=0)}
 
-            correctClasses = []
-            for instance in tree.testingData.instances:
-                correctClasses.append(instance[tree.testingData.className])
+    def treesPerformance(self):
+        '''
+        Returns the ratio of right guesses of each tree over its testing data, computed
+        once when the tree was trained.
+        '''
+        if len(self.oobPerformances) != len(self.trees):
+            raise AttributeError("Trees were not trained with out-of-bag testing data")
+        return list(self.oobPerformances)
 
-            rightGuesses = 0
-            for i in range(len(predictions)):
-                if predictions[i] == correctClasses[i]:
-                    rightGuesses += 1
+    def evaluateTreesPerformance(self):
+        printTreesPerformance(self.treesPerformance())
 
-            treePerformances.append(rightGuesses/len(tree.testingData.instances))
 
-        for i in range(len(treePerformances)):
-            print("    Tree {} got {:.2f}% of the instances right.".format(i, treePerformances[i]*100))
-            pass
+def printTreesPerformance(treePerformances):
+    for i in range(len(treePerformances)):
+        print("    Tree {} got {:.2f}% of the instances right.".format(i, treePerformances[i]*100))
 
 
 class DecisionTree(object):
 
-    def __init__(self, data, m=0, testingData=[]):
+    def __init__(self, data, m=0, testingData=[], numericSplit='mean', seed=None,
+                 lean=False, maxDepth=None, minSamplesSplit=2, minSamplesLeaf=1,
+                 minInfoGain=0.0, maxLeafNodes=None, reuseNumeric=False,
+                 criterion='entropy'):
         """
         :param data: dataset used by the root node
         :param m: size of the sample of features considered for the node
                   attribute
+        :param numericSplit: 'mean' splits numeric attributes at their mean value,
+                             'best' searches for the threshold with the highest gain and
+                             'histogram' does the same search over at most 256 bins
+        :param seed: seed for the sampling of attributes, drawn from the random module
+                     when not supplied
+        :param lean: release the data once trained, see release
+        :param maxDepth: nodes at this depth become leaves, the root is at depth 0
+        :param minSamplesSplit: nodes with fewer instances become leaves
+        :param minSamplesLeaf: attributes that would leave fewer instances in a part
+                               aren't considered
+        :param minInfoGain: nodes whose best attribute gains less information become
+                            leaves, only checked when it is above 0 since a split that
+                            gains nothing can come out slightly negative
+        :param maxLeafNodes: nodes are only split while the tree stays within this
+                             number of leaves, counting the nodes still to be trained
+        :param reuseNumeric: keep numeric attributes available below the node that
+                             split them, so they can be split again at other thresholds
+        :param criterion: 'entropy' selects attributes by information gain, 'gini' by
+                          the decrease of the Gini impurity, which is cheaper
         """
+        if numericSplit not in NUMERIC_SPLITS:
+            raise ValueError("Unknown numeric split '{}'".format(numericSplit))
+        if criterion not in CRITERIA:
+            raise ValueError("Unknown criterion '{}'".format(criterion))
         self.data = data
         self.testingData = testingData
+        self.className = data.className
+        # class labels, shared with the table of the data
+        self.classes = data.table.labels[data.className]
+        self.lean = lean
         self.root = None
+        # Table rows of the testing data and the class code predicted for each, see
+        # scoreOutOfBag
+        self.oobRows = None
+        self.oobPredictions = None
         self.m = m
+        self.numericSplit = numericSplit
+        self.maxDepth = maxDepth
+        self.minSamplesSplit = minSamplesSplit
+        self.minSamplesLeaf = minSamplesLeaf
+        self.minInfoGain = minInfoGain
+        self.maxLeafNodes = maxLeafNodes
+        self.reuseNumeric = reuseNumeric
+        self.criterion = criterion
+        # Leaves of the tree being trained plus the nodes waiting to be trained
+        self.leafNodes = 0
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.random = random.Random(seed)
+
+    def train(self):
+        """
+        Creates the nodes of a new tree one level at a time. The split statistics of the
+        attributes sampled by all the nodes of a level are computed together, see
+        summarizeLevel.
+        """
+        self.leafNodes = 1
+        self.root = None
+        # (data, depth, parent node, key in the parent's children) of each node to train
+        level = [(self.data, 0, None, None)]
+        while len(level) > 0:
+            # Nodes that may be split, with their sample of attributes
+            candidates = []
+            for item in level:
+                data, depth = item[0], item[1]
+                if data.uniformClass() or len(data.attributes) == 0 or self.stopSplitting(data, depth):
+                    self.attach(item, DecisionNode(leaf=True, guess=data.mostFrequentClass()))
+                else:
+                    node = DecisionNode(data=data, m=self.m, numericSplit=self.numericSplit,
+                                        rng=self.random, minSamplesLeaf=self.minSamplesLeaf,
+                                        criterion=self.criterion)
+                    node.sampleAttributes()
+                    candidates.append((node, item))
+
+            self.summarizeLevel([node for node, item in candidates])
+
+            nextLevel = []
+            for node, item in candidates:
+                data, depth = item[0], item[1]
+                splitDic = None
+                node.selectAttribute()
+                if node.attribute is not None and (self.minInfoGain <= 0 or
+                                                   node.gain >= self.minInfoGain):
+                    # Split the data amongst the possible values for the node`s attribute
+                    consume = not (self.reuseNumeric and node.numeric is not None)
+                    splitDic = data.split(node.attribute, node.numeric, consume=consume)
+                    if not self.acceptSplit(splitDic):
+                        splitDic = None
+
+                if splitDic is None:
+                    # Leaf node
+                    self.attach(item, DecisionNode(leaf=True, guess=data.mostFrequentClass()))
+                    continue
+
+                self.leafNodes += len(splitDic) - 1
+                # Unknown categoric values follow the part with the most instances
+                node.fallback = max(splitDic, key=lambda key: splitDic[key].size())
+                self.attach(item, node)
+                # Each part becomes a node of the next level
+                for key in splitDic:
+                    nextLevel.append((splitDic[key], depth + 1, node, key))
+
+            level = nextLevel
+
+        self.scoreOutOfBag()
+        if self.lean:
+            self.release()
+
+        return self.root
+
+    def attach(self, item, node):
+        """
+        Places a trained node at its position in the tree.
+        :param item: (data, depth, parent node, key) tuple describing the position
+        """
+        parent, key = item[2], item[3]
+        if parent is None:
+            self.root = node
+        else:
+            parent.children[key] = node
+
+    def summarizeLevel(self, nodes):
+        """
+        Computes the matrices used by attributeInfo for the attributes sampled by all
+        the nodes of a level, with a single counting pass over their values (see
+        levelContingencyTables). Numeric attributes are only handled for the 'mean'
+        split, the 'best' and 'histogram' searches are done by each node.
+        """
+        tasks = [(node, attr) for node in nodes for attr in node.sample
+                 if self.numericSplit == 'mean' or not node.data.isNumeric(attr)]
+        if len(tasks) == 0:
+            return
 
-    def train(self, data=None):
+        counts, means = levelContingencyTables([(node.data, attr) for node, attr in tasks])
+        for (node, attr), count, mean in zip(tasks, counts, means):
+            if mean is not None:
+                node.thresholds[attr] = mean
+                node.summaries[attr] = node.data.buildMatrix(count, ['lower', 'higher'],
+                                                             [False, True])
+            else:
+                node.summaries[attr] = node.data.buildMatrix(count, node.data.table.labels[attr])
+
+    def stopSplitting(self, data, depth):
         """
-        Recursively creates nodes for a new tree.
+        Checks the stopping criteria that don't depend on the attribute of the node.
+        :returns: True if the node must be a leaf
         """
-        isRootNode = False
-        if not data:
-            # Root node
-            isRootNode = True
-            data = self.data
+        if self.maxDepth is not None and depth >= self.maxDepth:
+            return True
+        if data.size() < self.minSamplesSplit:
+            return True
+        return False
 
-        if data.uniformClass() or len(data.attributes) == 0:
-            # Leaf node
-            curNode = DecisionNode(leaf=True, guess=data.mostFrequentClass())
+    def acceptSplit(self, splitDic):
+        """
+        Checks whether a node can be split into the parts in 'splitDic'. A split with an
+        empty part is rejected (every instance goes to the other part, the node would
+        be the same), as is one that exceeds the leaf budget.
+        """
+        if any(part.isEmpty() for part in splitDic.values()):
+            return False
+        if self.maxLeafNodes is not None and self.leafNodes + len(splitDic) - 1 > self.maxLeafNodes:
+            return False
+        return True
 
-        else:
-            # Not a leaf node, continue recursion
-            curNode = DecisionNode(data=data, m=self.m)
-            curNode.evaluate()
+    def structure(self):
+        """
+        Counts the nodes of the trained tree.
+        :returns: dictionary with the number of nodes, the number of leaves and the
+                  depth of the deepest leaf
+        """
+        if not self.root:
+            raise AttributeError("The decision tree has not yet been trained")
 
-            # Split the data amongst the possible values for curNode`s attribute
-            splitDic = data.split(curNode.attribute)
+        nodes = leaves = depth = 0
+        pending = [(self.root, 0)]
+        while len(pending) > 0:
+            node, nodeDepth = pending.pop()
+            nodes += 1
+            if node.leaf:
+                leaves += 1
+                depth = max(depth, nodeDepth)
+            pending.extend((child, nodeDepth + 1) for child in node.children.values())
+        return {'nodes': nodes, 'leaves': leaves, 'depth': depth}
+
+    def scoreOutOfBag(self):
+        """
+        Classifies the testing data, when it is a view of the training table, keeping
+        the predicted class codes so the forest can estimate its error without
+        classifying it again.
+        """
+        testingData = self.testingData
+        if not isinstance(testingData, Data) or testingData.table is not self.data.table:
+            return
+        if testingData.indices is None:
+            self.oobRows = array('i', range(testingData.size()))
+        else:
+            self.oobRows = testingData.indices
+        self.oobPredictions = self.compile().predictTrees(testingData)[0]
 
-            # Create new nodes for each data output
-            for key in splitDic:
+    def release(self):
+        """
+        Drops the data kept by the tree and its nodes once it is trained, leaving only
+        the split attributes, thresholds, children and guesses used to classify.
+        """
+        if not self.root:
+            raise AttributeError("The decision tree has not yet been trained")
 
-                if splitDic[key].isEmpty():
-                    # Empty data, create leaf node
-                    curNode = DecisionNode(leaf=True, guess=data.mostFrequentClass())
-                else:
-                    # Create a regular node
-                    curNode.children[key] = self.train(data=splitDic[key])
+        nodes = [self.root]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            node.data = None
+            node.thresholds = {}
+            node.partSizes = {}
+            node.summaries = {}
+            node.random = None
+            nodes.extend(node.children.values())
 
-        if isRootNode:
-            self.root = curNode
+        self.data = None
+        self.testingData = None
 
-        return curNode
+    def compile(self):
+        """
+        Flattens the trained tree into arrays for batch prediction.
+        :returns: CompiledForest containing this tree
+        """
+        return CompiledForest.fromTrees([self], self.classes)
 
     def display(self, valName='', indent=0, start=None):
 
@@ -151,7 +528,7 @@ class DecisionTree(object):
         if start.leaf:
             print("{}- {} -> {}".format(s, valName, start.guess))
         else:
-            if start.numeric:
+            if start.numeric is not None:
                 print("{}- {} -> {} ({})".format(s, valName, start.attribute, start.numeric))
             else:
                 print("{}- {}   ".format(s, valName))
@@ -162,7 +539,8 @@ class DecisionTree(object):
 
     def classify(self, instance, node=None):
         """
-        Recursively navigates the tree to classify a new instance
+        Navigates the tree from 'node' (the root when not supplied) to classify a new
+        instance
         :returns: predicted class name for the given instance
         """
         if not self.root:
@@ -171,39 +549,48 @@ class DecisionTree(object):
         if not node:
             node = self.root
 
-        if node.leaf:
-            # Leaf node
-            return node.guess
-        else:
+        while not node.leaf:
             # print("node.attribute: {}, instance: {}\nnode.children: {}".format(node.attribute, instance, node.children))
-            if node.data.isNumeric(node.attribute):
+            if node.numeric is not None:
                 # Numeric attributes
                 if float(instance[node.attribute]) <= node.numeric:
-                    nextNode = node.children[0]
+                    node = node.children[0]
                 else:
-                    nextNode = node.children[1]
+                    node = node.children[1]
             else:
                 # Categoric attributes
                 if instance[node.attribute] in node.children.keys():
                     # Value is known, follow the tree
-                    nextNode = node.children[instance[node.attribute]]
+                    node = node.children[instance[node.attribute]]
 
                 else:
-                    # Value is not known, guess
-                    keyName = choice(list(node.children.keys()))
-                    nextNode = node.children[keyName]
+                    # Value is not known, follow the part that had the most instances
+                    # so the prediction doesn't depend on chance
+                    if node.fallback in node.children:
+                        node = node.children[node.fallback]
+                    else:
+                        node = next(iter(node.children.values()))
 
-            return self.classify(instance, node=nextNode)
+        # Leaf node
+        return node.guess
 
 
 class DecisionNode(object):
 
-    def __init__(self, data=None, m=0, guess=None, leaf=False):
+    def __init__(self, data=None, m=0, guess=None, leaf=False, numericSplit='mean',
+                 rng=None, minSamplesLeaf=1, criterion='entropy'):
         """
         :param data: dataset used by the node
         :param m: size of the sample of features considered for the node
                   attribute
         :param guess: class guess for a leaf node
+        :param numericSplit: how numeric attributes are split, see DecisionTree
+        :param rng: random.Random used to sample the attributes, the random module is
+                    used when not supplied
+        :param minSamplesLeaf: attributes that would leave fewer instances in a part
+                               aren't selected
+        :param criterion: impurity measuring the information of the attributes, see
+                          DecisionTree
         """
         # dataset
         self.data = data
@@ -214,6 +601,25 @@ class DecisionNode(object):
         self.guess = guess
         self.leaf = leaf
         self.numeric = None
+        # child followed by values not seen in training
+        self.fallback = None
+        self.numericSplit = numericSplit
+        self.criterion = criterion
+        self.random = rng
+        # thresholds found for the numeric attributes evaluated by the node
+        self.thresholds = {}
+        # number of instances in each part of the attributes evaluated by the node
+        self.partSizes = {}
+        # attributes sampled by sampleAttributes
+        self.sample = []
+        # attr -> matrix returned by summarize, computed for several nodes at once by
+        # DecisionTree.summarizeLevel
+        self.summaries = {}
+        self.minSamplesLeaf = minSamplesLeaf
+        # information gain of the selected attribute
+        self.gain = None
+        # cached result of classInfo
+        self.classInformation = None
         # Validate
         if self.leaf:
             if self.data:
@@ -234,59 +640,50 @@ class DecisionNode(object):
     def __repr__(self):
         return "<DecisionNode {}>".format(self.attribute)
 
-    def attributeInfo(self, attrName):
+    def attributeParts(self, attrName):
         """
-        Calculates the information value for a given attribute.
+        Finds how the node would split its instances with a given attribute.
+        :returns: list with the class counts of each part
         """
-        if self.data.isNumeric(attrName):
-            m = self.data.summarizeNumeric(attrName)
+        if attrName in self.summaries:
+            m = self.summaries[attrName]
+        elif self.data.isNumeric(attrName):
+            if self.numericSplit == 'best':
+                self.thresholds[attrName] = self.data.bestThreshold(attrName, self.criterion,
+                                                                    self.minSamplesLeaf)
+            elif self.numericSplit == 'histogram':
+                self.thresholds[attrName] = self.data.bestBinThreshold(attrName, self.criterion,
+                                                                       self.minSamplesLeaf)
+
+            if self.thresholds.get(attrName) is not None and self.numericSplit == 'histogram':
+                m = self.data.summarizeBins(attrName, self.thresholds[attrName])
+            else:
+                m = self.data.summarizeNumeric(attrName, self.thresholds.get(attrName))
         else:
             m = self.data.summarize(attrName)
 
-        n = len(self.data.instances)
-        info = 0
-
-        # Calculate each part of the sum
-        for col in range(1, len(m[0])):
-            # Each attribute value
-            sum = 0
-            for row in range(1, len(m)):
-                # Each row
-                if float(m[-1][col]) != 0:
-                    # No occurances of a class value, happens for numeric attributes
-                    x = float(m[row][col])/float(m[-1][col])
-                else:
-                    x = 0
-                if x != 0:
-                    sum = sum - x*log(x, 2)
+        self.partSizes[attrName] = [m[-1][col] for col in range(1, len(m[0]))]
+        return matrixParts(m)
 
-            info += (m[-1][col]/n)*sum
+    def classCounts(self):
+        return list(self.data.classHistogram().values())
 
-        return info
+    def attributeInfo(self, attrName):
+        """
+        Calculates the information value (the impurity left in the parts, weighted by
+        their sizes) for a given attribute.
+        """
+        parts = self.attributeParts(attrName)
+        return evaluateSplits(self.classCounts(), [parts], self.criterion)[0][0]
 
     def classInfo(self):
         """
-        Calculates the class information value.
-        """
-        n = len(self.data.instances)
-        sum = 0
-        classDic = {}
-        className = self.data.className
-        # Count the occurances of all class values
-        for entry in self.data.instances:
-            if entry[className] not in classDic.keys():
-                # Class value not yet added
-                classDic[entry[className]] = 1
-            else:
-                num = classDic[entry[className]]
-                classDic[entry[className]] = num + 1
-
-        # Calculate information
-        for key in classDic.keys():
-            x = float(classDic[key])/float(n)
-            sum -= x*log(x, 2)
-
-        return sum
+        Calculates the class information value (the impurity of the node), which is the
+        same for every attribute of the node and therefore computed only once.
+        """
+        if self.classInformation is None:
+            self.classInformation = impurity(self.classCounts(), self.criterion)
+        return self.classInformation
 
     def infoGain(self, attrName):
         """
@@ -306,27 +703,52 @@ class DecisionNode(object):
                 raise SystemError("Cannot evaluate leaf node with no guess")
             return
 
-        # Use a sample of m random attributes
+        self.sampleAttributes()
+        self.selectAttribute()
+
+    def sampleAttributes(self):
+        """
+        Draws the sample of m random attributes evaluated by the node.
+        :returns: list with the sampled attributes
+        """
         attrList = self.data.attributes
-        shuffle(attrList)
+        (self.random if self.random is not None else random).shuffle(attrList)
         if len(attrList) == 0:
             raise SystemError("Attribute list is empty")
+        self.sample = attrList[0:self.m]
+        return self.sample
+
+    def selectAttribute(self):
+        """
+        Selects the sampled attribute with the highest information gain, see evaluate.
+        """
+        # print("Selecting attribute amongst: {}".format(self.sample))
+        # The gains of every sampled attribute are computed at once
+        splits = [self.attributeParts(attr) for attr in self.sample]
+        gains = evaluateSplits(self.classCounts(), splits, self.criterion)
 
-        # print("Selecting attribute amongst: {}".format(attrList[0:self.m]))
         # Find the attribute with the highest amount of information
         highest = ("", 0)
-        for attr in attrList[0:self.m]:
-            infoGain = self.infoGain(attr)
+        for attr, (info, infoGain) in zip(self.sample, gains):
+            if self.minSamplesLeaf > 1 and min(self.partSizes[attr]) < self.minSamplesLeaf:
+                # Would leave too few instances in a part
+                continue
             if infoGain > highest[1] or highest[0] == "":
                 # Found better attribute or initialzes
                 highest = (attr, infoGain)
 
+        if highest[0] == "":
+            # No attribute can be used, the node must be a leaf
+            return
         self.attribute = highest[0]
+        self.gain = highest[1]
         # print("Selected attribute: {} ({})".format(self.attribute, self.data.isNumeric(self.attribute)))
 
         # Check for numeric attributes
         if self.data.isNumeric(self.attribute):
-            self.numeric = self.data.calculateMean(self.attribute)
+            self.numeric = self.thresholds.get(self.attribute)
+            if self.numeric is None:
+                self.numeric = self.data.calculateMean(self.attribute)
             # Initialize the children dictionary
             self.children[0] = None # For values <=
             self.children[1] = None # For values >
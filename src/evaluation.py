@@ -0,0 +1,257 @@
+from data import deriveSeed
+from decisionTree import RandomForest, printTreesPerformance
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+import random
+import profiling
+
+def generateFoldData(data, nForests=10, rng=None):
+    '''
+    Splits the instances into 'nForests' stratified folds, drawn with 'rng'.
+    Returns a list with a (training data, testing data) tuple for each fold, where the
+    testing data is the fold and the training data is the other folds. Both are views
+    sharing the table of 'data'.
+    '''
+    #Splits instances into folds
+    folds = data.generateStratifiedFolds(nForests, rng=rng)
+
+    foldData = []
+    #Repeats using each fold as testing data once
+    for iteration in range(len(folds)):
+        #Adds one fold as testing data
+        testingData = data.view(folds[iteration])
+
+        #Adds the other folds as training data
+        trainingRows = array('i')
+        for i in range(len(folds)):
+            if i != iteration:  #Skips the fold used as testing set
+                trainingRows.extend(folds[i])
+        trainingData = data.view(trainingRows)
+
+        foldData.append((trainingData, testingData))
+
+    return foldData
+
+def evaluateFold(trainingData, testingData, nTrees=10, treeJobs=1, seed=None):
+    '''
+    Trains a forest with 'nTrees' trees and the given 'seed' and classifies the testing
+    data.
+    Returns a dictionary with the average performance, precision and recall over every
+    class and the performance of each tree over its out-of-bag instances.
+    '''
+    return evaluateFoldSizes(trainingData, testingData, [nTrees], treeJobs, seed)[0]
+
+def evaluateFoldSizes(trainingData, testingData, treeCounts, treeJobs=1, seed=None):
+    '''
+    Trains a single forest with as many trees as the largest value in 'treeCounts' and
+    evaluates its first k trees for every k in 'treeCounts', reusing the predictions of
+    each tree. With the same 'seed' the results match evaluateFold for each k.
+    Returns a list with the dictionary returned by evaluateFold for each k. When
+    profiling is enabled they also hold the profile of the fold under 'profile', see
+    RandomForest.profileReport.
+    '''
+    if profiling.isEnabled():
+        profiling.reset()   #Only this fold is reported
+
+    #Creates and trains the largest forest
+    forest = RandomForest(trainingData, testingData, seed=seed)
+    forest.generateForest(max(treeCounts), nJobs=treeJobs)
+    treePerformances = forest.treesPerformance()
+
+    #Classifies the testing set with every tree in one batch
+    compiled = forest.compile()
+    predictions = compiled.predictTrees(forest.testingData)
+    correctClasses = forest.testingData.column(forest.testingData.className)
+    labels = forest.testingData.table.labels[forest.testingData.className]
+    correctClasses = [labels[code] for code in correctClasses]
+    classValues = forest.testingData.listClassValues()
+
+    profile = forest.profileReport() if profiling.isEnabled() else None
+
+    #Adds the votes of the trees in order, evaluating each prefix of the forest
+    results = {}
+    counts = None
+    counted = 0
+    for nTrees in sorted(set(treeCounts)):
+        counts = compiled.voteCounts(predictions[counted:nTrees], counts)
+        counted = nTrees
+        result = classMetrics(compiled.majorityVote(counts), correctClasses, classValues)
+        result['treePerformances'] = treePerformances[:nTrees]
+        if profile is not None:
+            result['profile'] = profile
+        results[nTrees] = result
+
+    return [results[nTrees] for nTrees in treeCounts]
+
+def classMetrics(predictions, correctClasses, classValues):
+    '''
+    Compares the predicted classes with the correct ones.
+    Returns a dictionary with the average performance, precision and recall over every
+    class in 'classValues'.
+    '''
+    iterationPerformances = []
+    iterationPrecisions = []
+    iterationRecalls = []
+    #Calculates performance, recall and precision for every class
+    for classValue in classValues:
+        positiveClass = classValue
+
+        truePositives = 0
+        falsePositives = 0
+        trueNegatives = 0
+        falseNegatives = 0
+        for i in range(len(predictions)):
+            if predictions[i] == positiveClass:   #Predicted positive
+                if correctClasses[i] == positiveClass:    #Supposed to be positive
+                    truePositives += 1
+                else:    #Supposed to be negative
+                    falsePositives +=1
+            else:   #Predicted negative
+                if correctClasses[i] != positiveClass:    #Supposed to be negative
+                    trueNegatives +=1
+                else:    #Supposed to be positive
+                    falseNegatives += 1
+
+        iterationPerformances.append((truePositives+trueNegatives)/len(predictions))    #Right guesses
+        iterationPrecisions.append(truePositives / (truePositives + falsePositives))    #Right guesses from instances guessed positive
+        iterationRecalls.append(truePositives / (truePositives + falseNegatives))   #Right guesses from instances that were supposed to be positive
+
+    #Calculates average performance, recall and precision for this iteration
+    return {'performance': sum(iterationPerformances)/len(iterationPerformances),
+            'precision': sum(iterationPrecisions)/len(iterationPrecisions),
+            'recall': sum(iterationRecalls)/len(iterationRecalls)}
+
+def summarizeFolds(foldResults, nTrees):
+    '''
+    Merges the dictionaries returned by evaluateFold for every fold.
+    Returns a dictionary with the average performance, precision, recall and F1-measure.
+    '''
+    allPerformances = []
+    allPrecisions = []
+    allRecalls = []
+    for iteration in range(len(foldResults)):
+        result = foldResults[iteration]
+        print("----- Forest {} -----".format(iteration))
+        printTreesPerformance(result['treePerformances'])
+        print("Forest performance: {:.2f}% of guesses (precision: {:.2f}% / recall: {:.2f}%)".format(result['performance']*100, result['precision']*100, result['recall']*100))
+
+        allPerformances.append(result['performance'])   #Adds this iteration's performance to the list
+        allPrecisions.append(result['precision'])   #Adds this iteration's precision to the list
+        allRecalls.append(result['recall'])   #Adds this iteration's recall to the list
+
+    #Calculates averages for all iterations
+    avgPerformance = sum(allPerformances)/len(allPerformances)
+    avgPrecision = sum(allPrecisions)/len(allPrecisions)
+    avgRecall = sum(allRecalls)/len(allRecalls)
+    #Calculates F1-Measure for all iterations
+    f1 = (2*avgPrecision*avgRecall) / (avgPrecision+avgRecall)
+
+    # print("----------")
+    # print("Model's average performance ({} trees): {:.2f}% (precision: {:.2f}% / recall: {:.2f}%)".format(nTrees, avgPerformance*100, avgPrecision*100, avgRecall*100))
+    # print("F1-measure from averages: {:.2f}%".format(f1*100))
+    # print("----------")
+    dic = {'nTrees': nTrees, 'avgPerformance': avgPerformance*100,
+           'avgPrecision': avgPrecision*100, 'avgRecall': avgRecall*100,
+           'f1measure': f1*100}
+    return dic
+
+def foldTasks(data, nForests=10, nTrees=10, treeJobs=1, seed=None):
+    '''
+    Returns the arguments of evaluateFold (or evaluateFoldSizes, when 'nTrees' is a
+    list of tree counts) for every fold. The folds and the forest of each fold use
+    their own seeds derived from 'seed', which is drawn from the random module when
+    not supplied, so the results only depend on it.
+    '''
+    if seed is None:
+        seed = random.getrandbits(64)
+    foldData = generateFoldData(data, nForests, random.Random(deriveSeed(seed, 'folds')))
+    return [(trainingData, testingData, nTrees, treeJobs, deriveSeed(seed, 'fold', i))
+            for i, (trainingData, testingData) in enumerate(foldData)]
+
+def submitPerformance(executor, data, nForests=10, nTrees=10, treeJobs=1, seed=None):
+    '''
+    Submits the evaluation of every fold to 'executor'.
+    Returns the list of futures, to be merged with summarizeFolds.
+    '''
+    return [executor.submit(evaluateFold, *task)
+            for task in foldTasks(data, nForests, nTrees, treeJobs, seed)]
+
+def submitTreeCounts(executor, data, treeCounts, nForests=10, treeJobs=1, seed=None):
+    '''
+    Submits the evaluation of every fold for every number of trees in 'treeCounts' to
+    'executor', training a single forest per fold.
+    Returns the list of futures, to be merged with summarizeTreeCounts.
+    '''
+    return [executor.submit(evaluateFoldSizes, *task)
+            for task in foldTasks(data, nForests, list(treeCounts), treeJobs, seed)]
+
+def summarizeTreeCounts(foldResults, treeCounts):
+    '''
+    Merges the lists returned by evaluateFoldSizes for every fold.
+    Returns a list with the dictionary returned by summarizeFolds for each number of trees.
+    '''
+    return [summarizeFolds([result[i] for result in foldResults], nTrees)
+            for i, nTrees in enumerate(treeCounts)]
+
+def evaluateTreeCounts(data, treeCounts, nForests=10, nJobs=1, treeJobs=1, seed=None):
+    '''
+    Evaluates forests with every number of trees in 'treeCounts' using stratified
+    'nForests'-fold cross validation, training only the largest forest on each fold.
+    See evaluatePerformance for 'nJobs', 'treeJobs' and 'seed'.
+    Returns a list with the dictionary returned by evaluatePerformance for each number
+    of trees.
+    '''
+    treeCounts = list(treeCounts)
+    if nJobs > 1:
+        with ProcessPoolExecutor(max_workers=nJobs) as executor:
+            futures = submitTreeCounts(executor, data, treeCounts, nForests, treeJobs, seed)
+            foldResults = [future.result() for future in futures]
+    else:
+        foldResults = [evaluateFoldSizes(*task)
+                       for task in foldTasks(data, nForests, treeCounts, treeJobs, seed)]
+
+    return summarizeTreeCounts(foldResults, treeCounts)
+
+def evaluateOutOfBag(data, nTrees=10, nJobs=1, seed=None):
+    '''
+    Trains a single forest with 'nTrees' trees over all of 'data' and estimates its
+    performance from the votes of the trees over the instances left out of their
+    bootstraps, much faster than cross validation.
+    Returns a dictionary with the same keys as summarizeFolds.
+    '''
+    forest = RandomForest(data, None, seed=seed)
+    forest.generateForest(nTrees, nJobs=nJobs)
+    rows, predictions = forest.outOfBagPredictions()
+    correctClasses = [data.table.value(data.className, row) for row in rows]
+
+    result = classMetrics(predictions, correctClasses, data.listClassValues())
+    print("Out-of-bag performance: {:.2f}% of guesses (precision: {:.2f}% / recall: {:.2f}%)".format(result['performance']*100, result['precision']*100, result['recall']*100))
+    f1 = (2*result['precision']*result['recall']) / (result['precision']+result['recall'])
+    return {'nTrees': nTrees, 'avgPerformance': result['performance']*100,
+            'avgPrecision': result['precision']*100, 'avgRecall': result['recall']*100,
+            'f1measure': f1*100}
+
+def evaluatePerformance(data, nForests=10, nTrees=10, nJobs=1, treeJobs=1, oob=False,
+                        seed=None):
+    '''
+    Evaluates a forest with 'nTrees' trees using stratified 'nForests'-fold cross
+    validation. With 'nJobs' > 1 the folds are evaluated in that many worker processes,
+    'treeJobs' is the number of processes training the trees of each fold and should
+    be left at 1 when the folds run in parallel.
+    With 'oob' the folds are skipped and the performance is estimated out-of-bag, see
+    evaluateOutOfBag.
+    The same 'seed' gives the same results for any 'nJobs' and 'treeJobs', one is drawn
+    from the random module when not supplied.
+    '''
+    if oob:
+        return evaluateOutOfBag(data, nTrees, nJobs=max(nJobs, treeJobs), seed=seed)
+
+    if nJobs > 1:
+        with ProcessPoolExecutor(max_workers=nJobs) as executor:
+            futures = submitPerformance(executor, data, nForests, nTrees, treeJobs, seed)
+            foldResults = [future.result() for future in futures]
+    else:
+        foldResults = [evaluateFold(*task)
+                       for task in foldTasks(data, nForests, nTrees, treeJobs, seed)]
+
+    return summarizeFolds(foldResults, nTrees)
@@ -2,17 +2,17 @@ from data import Data
 from decisionTree import DecisionNode, DecisionTree, RandomForest
 
 # ------------------------------------------------ Credit g (https://www.openml.org/d/31)
-def setupCredit():
+def setupCredit(cache=True):
     filename = '../data/credit-g.csv'
     className = 'class'
     data = Data(className, numeric=['duration', 'credit_amount', 'installment_commitment', 
                                     'residence_since', 'age', 'existing_credits', 
                                     'num_dependents'])
-    data.parseFromFile(filename, delimiter=',', quotechar='"')
+    data.parseFromFile(filename, delimiter=',', quotechar='"', cache=cache)
     return data
 
 # ------------------------------------------------ Spambase (https://www.openml.org/d/44)
-def setupSpambase():
+def setupSpambase(cache=True):
     filename = '../data/spambase.csv'
     className = 'class'
     data = Data(className, numeric=['word_freq_make','word_freq_address','word_freq_all',
@@ -29,19 +29,19 @@ def setupSpambase():
     'word_freq_edu','word_freq_table','word_freq_conference','char_freq_%3B',
     'char_freq_%28','char_freq_%5B','char_freq_%21','char_freq_%24','char_freq_%23',
     'capital_run_length_average','capital_run_length_longest','capital_run_length_total'])
-    data.parseFromFile(filename, delimiter=',', quotechar='"')
+    data.parseFromFile(filename, delimiter=',', quotechar='"', cache=cache)
     return data
 
 # --------------------------------------- Vertebra Column (https://www.openml.org/d/1523)
-def setupVertebra():
+def setupVertebra(cache=True):
     filename = '../data/vertebra-column.csv'
     className = 'Class'
     data = Data(className, numeric=['V1','V2','V3','V4','V5','V6'])
-    data.parseFromFile(filename, delimiter=',', quotechar='"')
+    data.parseFromFile(filename, delimiter=',', quotechar='"', cache=cache)
     return data
 
 # ------------------------------------------------- Wine (https://www.openml.org/d/187)
-def setupWine():
+def setupWine(cache=True):
     filename = '../data/wine.csv'
     className = 'class'
     data = Data(className, numeric=['Alcohol','Malic_acid','Ash','Alcalinity_of_ash',
@@ -49,13 +49,17 @@ def setupWine():
                                     'Nonflavanoid_phenols','Proanthocyanins',
                                     'Color_intensity','Hue',
                                     'OD280%2FOD315_of_diluted_wines','Proline'])
-    data.parseFromFile(filename, delimiter=',', quotechar='"')
+    data.parseFromFile(filename, delimiter=',', quotechar='"', cache=cache)
     return data
 
 # -------------------------------------------------- Benchmark
-def setupBenchmark():
+def setupBenchmark(cache=True):
     filename = '../data/dadosBenchmark_validacaoAlgoritmoAD.csv'
     className = 'Joga'
     data = Data(className)
-    data.parseFromFile(filename, delimiter=';', quotechar='"')
+    data.parseFromFile(filename, delimiter=';', quotechar='"', cache=cache)
     return data
+
+# Name of each bundled dataset and the function loading it
+DATASETS = {'benchmark': setupBenchmark, 'wine': setupWine, 'vertebra': setupVertebra,
+            'credit': setupCredit, 'spambase': setupSpambase}
@@ -0,0 +1,77 @@
+from itertools import repeat
+from math import log2
+from operator import mul
+
+# Impurity measures that can be used to select attributes
+CRITERIA = ('entropy', 'gini')
+
+# x*log2(x) for every integer x, see nlognTable
+_nlogn = [0.0]
+
+
+def nlognTable(n):
+    """
+    Returns a list holding x*log2(x) at index x for every integer up to at least 'n',
+    extending it when needed, so entropies of class counts are found by indexing.
+    """
+    if len(_nlogn) <= n:
+        _nlogn.extend(x*log2(x) for x in range(len(_nlogn), 2*n + 1))
+    return _nlogn
+
+
+def scaledImpurity(counts, size, criterion='entropy'):
+    """
+    Returns the impurity of a part with the integer class 'counts', which add up to
+    'size', multiplied by 'size'. Weighting the parts of a split is then just adding
+    them up.
+    """
+    if size == 0:
+        return 0.0
+    if criterion == 'entropy':
+        table = nlognTable(size)
+        return table[size] - sum(map(table.__getitem__, counts))
+    return size - sum(map(mul, counts, counts))/size
+
+
+def impurity(counts, criterion='entropy'):
+    """
+    Returns the impurity of a set of instances with the integer class 'counts', in bits
+    for 'entropy'.
+    """
+    size = sum(counts)
+    return scaledImpurity(counts, size, criterion)/size if size > 0 else 0.0
+
+
+def evaluateSplits(parentCounts, splits, criterion='entropy'):
+    """
+    Evaluates many candidate splits of the same instances at once.
+    :param parentCounts: class counts of the instances being split
+    :param splits: list of candidate splits, each a list with the class counts of its
+                   parts
+    :returns: list with a (weighted impurity of the parts, gain) tuple for each split
+    """
+    n = sum(parentCounts)
+    if n == 0:
+        return [(0.0, 0.0)]*len(splits)
+    nlognTable(n)
+    parent = scaledImpurity(parentCounts, n, criterion)/n
+
+    # Every part of every split is scored in a single pass
+    parts = [part for split in splits for part in split]
+    scores = list(map(scaledImpurity, parts, map(sum, parts), repeat(criterion)))
+
+    results = []
+    start = 0
+    for split in splits:
+        child = sum(scores[start:start + len(split)])/n
+        results.append((child, parent - child))
+        start += len(split)
+    return results
+
+
+def matrixParts(m):
+    """
+    Returns the class counts of each part (column) of a matrix returned by
+    Data.summarize.
+    """
+    return [list(column) for column in zip(*[row[1:] for row in m[1:-1]])]
@@ -3,15 +3,56 @@ from data import Data
 from decisionTree import DecisionNode, DecisionTree, RandomForest
 import examples
 import sys
-from runSuite import evaluatePerformance
+from evaluation import evaluatePerformance
+from compiled import CompiledForest
+
+
+def scoreFile(model, testingFile, outputFile='-', votes=False):
+    """
+    Streams the instances of 'testingFile' through the model, writing the predictions to
+    'outputFile'. '-' reads from stdin or writes to stdout. Throughput is reported on
+    stderr so it doesn't mix with the predictions.
+    """
+    inFile = sys.stdin if testingFile == '-' else open(testingFile, mode='r', newline='')
+    outFile = sys.stdout if outputFile == '-' else open(outputFile, mode='w', newline='',
+                                                       buffering=1 << 20)
+    try:
+        stats = model.scoreCsv(inFile, outFile, delimiter=',', quotechar='"', votes=votes)
+    finally:
+        if inFile is not sys.stdin:
+            inFile.close()
+        if outFile is not sys.stdout:
+            outFile.close()
+    print("----- Classified {} instances in {:.2f}s ({:.0f} instances/s) -----".format(
+        stats['rows'], stats['seconds'], stats['rowsPerSecond']), file=sys.stderr)
 
 
 # -------------------------------------------------------------------
+#Writes the votes for each class along with the predictions
+votes = '--votes' in sys.argv
+if votes:
+    sys.argv.remove('--votes')
+
 if len(sys.argv) == 1:  #No arguments
     #Run sample code
     print("----- No file supplied, running sample code! -----")
     data = examples.setupWine()
     evaluatePerformance(data, 10, 10)
+elif len(sys.argv) == 6 and sys.argv[1] == '--save':    #Model file, training dataset, target class and numeric attributes
+    #Trains the model with the training dataset and saves it
+    print("----- Training model and saving it to {}! -----".format(sys.argv[2]))
+    numericAttributes = sys.argv[5].split(',')  #Splits numeric attributes into a list
+
+    trainingData = Data(sys.argv[4], numericAttributes)
+    trainingData.parseFromFile(sys.argv[3], delimiter=',', quotechar='"')   #Parses training data
+
+    forest = RandomForest(trainingData, None, lean=True)
+    forest.generateForest() #Trains the model
+    forest.compile().save(sys.argv[2])
+elif len(sys.argv) in (4, 5) and sys.argv[1] == '--model':    #Model file, testing dataset and optional output file
+    #Loads a saved model and classifies the instances in the testing dataset
+    model = CompiledForest.load(sys.argv[2])
+    scoreFile(model, sys.argv[3], sys.argv[4] if len(sys.argv) == 5 else '-', votes)
 elif len(sys.argv) == 4:    #Three arguments: training dataset, target class and numeric attributes
     #Run performance evaluation on the supplied dataset
     print("----- Running performance evaluation with the supplied dataset! -----")
@@ -21,24 +62,21 @@ elif len(sys.argv) == 4:    #Three arguments: training dataset, target class and
     data.parseFromFile(sys.argv[1], delimiter=',', quotechar='"')   #Parses data from supplied dataset
 
     evaluatePerformance(data)
-elif len(sys.argv) == 5:    #Four arguments: training dataset, target class, numeric attributs, testing dataset
+elif len(sys.argv) in (5, 6) and sys.argv[1] != '--save':    #Training dataset, target class, numeric attributs, testing dataset and optional output file
     #Trains the model with the training dataset and then classifies the instances in the testing dataset
-    print("----- Training model and classifiying supplied instances! -----")
+    print("----- Training model and classifiying supplied instances! -----", file=sys.stderr)
     numericAttributes = sys.argv[3].split(',')  #Splits numeric attributes into a list
 
     trainingData = Data(sys.argv[2], numericAttributes)
     trainingData.parseFromFile(sys.argv[1], delimiter=',', quotechar='"')   #Parses training data
-    testingData = Data(sys.argv[2], numericAttributes)
-    testingData.parseFromFile(sys.argv[4], delimiter=',', quotechar='"')    #Parses testing data
 
-    forest = RandomForest(trainingData, testingData)
+    forest = RandomForest(trainingData, None, lean=True)
     forest.generateForest() #Trains the model
 
-    print("----- Training finished, classifying. -----")
+    print("----- Training finished, classifying. -----", file=sys.stderr)
 
-    #Classifies training data
-    for instance in forest.testingData.instances:
-        print(forest.classify(instance))
+    #Classifies the testing data in chunks
+    scoreFile(forest.compile(), sys.argv[4], sys.argv[5] if len(sys.argv) == 6 else '-', votes)
 else:
     print("Invalid arguments! Please use one of the options below:")
     print("")
@@ -46,8 +84,14 @@ else:
     print("    Providing no arguments will run sample code")
     print('"python main.py <dataset> <target class> <comma separated list of numeric attributes>"')
     print("    Providing a dataset, target class and numeric attributes will run performance evaluation on the specified dataset")
-    print('"python main.py <training dataset> <target class> <comma separated list of numeric attributes> <testing dataset>"')
+    print('"python main.py <training dataset> <target class> <comma separated list of numeric attributes> <testing dataset> [<output file>] [--votes]"')
     print("    Providing a dataset, target class, numeric attributes and testing dataset will train the model and classify the instances in the testing dataset")
+    print("    Predictions are written to the output file or to stdout, use '-' as testing dataset to read it from stdin")
+    print("    With --votes the number of votes for each class is written along with the predictions")
+    print('"python main.py --save <model file> <training dataset> <target class> <comma separated list of numeric attributes>"')
+    print("    Trains the model with the training dataset and saves it to the model file")
+    print('"python main.py --model <model file> <testing dataset> [<output file>] [--votes]"')
+    print("    Loads a saved model and classifies the instances in the testing dataset, as above")
 
 
 # Print instance info for debug
@@ -0,0 +1,136 @@
+import time
+from functools import wraps
+
+# phase -> [seconds, calls, rows], see record
+_records = {}
+# (class, method name) -> original function, while profiling is enabled
+_originals = {}
+
+
+def _size(data):
+    # Data objects have a size method, tables a size attribute
+    return data.size() if callable(data.size) else data.size
+
+
+def _hotPaths():
+    """
+    Returns the instrumented methods as (class, method name, phase, rows) tuples, where
+    rows computes the number of rows processed by a call from its arguments.
+    """
+    from data import Data
+    from decisionTree import RandomForest, DecisionTree, DecisionNode
+    from compiled import CompiledForest
+    return [
+        (Data, 'stratifiedBootstrap', 'bootstrap', lambda args: args[0].size()),
+        (Data, 'bootstrap', 'bootstrap', lambda args: args[0].size()),
+        (Data, 'summarize', 'summarize', lambda args: args[0].size()),
+        (Data, 'summarizeNumeric', 'summarizeNumeric', lambda args: args[0].size()),
+        (Data, 'summarizeBins', 'summarizeBins', lambda args: args[0].size()),
+        (Data, 'bestThreshold', 'bestThreshold', lambda args: args[0].size()),
+        (Data, 'bestBinThreshold', 'bestBinThreshold', lambda args: args[0].size()),
+        (Data, 'split', 'split', lambda args: args[0].size()),
+        (DecisionNode, 'classInfo', 'classInfo', lambda args: args[0].data.size()),
+        (DecisionTree, 'summarizeLevel', 'summarizeLevel',
+         lambda args: sum(node.data.size() for node in args[1])),
+        (DecisionTree, 'train', 'train', lambda args: args[0].data.size()),
+        (DecisionTree, 'scoreOutOfBag', 'outOfBag', lambda args: _size(args[0].testingData)),
+        (RandomForest, 'classify', 'classify', lambda args: 1),
+        (CompiledForest, 'predictTrees', 'predictTrees', lambda args: _size(args[1])),
+    ]
+
+
+def _instrument(function, phase, rows):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        # Counted before the call, which may release the data (see DecisionTree.release)
+        numRows = rows(args)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(phase, time.perf_counter() - start, numRows)
+    return wrapper
+
+
+def enable():
+    """
+    Starts recording the time, calls and rows of the training and classification hot
+    paths. Their methods are replaced by timed wrappers, so nothing is paid while
+    profiling is disabled.
+    """
+    if len(_originals) > 0:
+        return
+    for cls, name, phase, rows in _hotPaths():
+        original = cls.__dict__[name]
+        _originals[(cls, name)] = original
+        setattr(cls, name, _instrument(original, phase, rows))
+
+
+def disable():
+    """
+    Restores the original methods. The records are kept until reset.
+    """
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+def isEnabled():
+    return len(_originals) > 0
+
+
+def record(phase, seconds, rows=0):
+    """
+    Adds a call of 'phase' taking 'seconds' over 'rows' rows.
+    """
+    entry = _records.get(phase)
+    if entry is None:
+        entry = _records[phase] = [0.0, 0, 0]
+    entry[0] += seconds
+    entry[1] += 1
+    entry[2] += rows
+
+
+def reset():
+    _records.clear()
+
+
+def collect():
+    """
+    Returns the records of this process and clears them, to be merged with the records
+    of another process.
+    """
+    records = {phase: list(entry) for phase, entry in _records.items()}
+    reset()
+    return records
+
+
+def merge(records):
+    """
+    Adds records returned by collect, usually in a worker process.
+    """
+    for phase, (seconds, calls, rows) in records.items():
+        entry = _records.get(phase)
+        if entry is None:
+            entry = _records[phase] = [0.0, 0, 0]
+        entry[0] += seconds
+        entry[1] += calls
+        entry[2] += rows
+
+
+def report():
+    """
+    Returns a list with a dictionary for each phase recorded since the last reset, with
+    its total seconds (including the phases it calls), calls and rows, from the slowest.
+    """
+    phases = [{'phase': phase, 'seconds': seconds, 'calls': calls, 'rows': rows}
+              for phase, (seconds, calls, rows) in _records.items()]
+    return sorted(phases, key=lambda x: x['seconds'], reverse=True)
+
+
+def formatReport(phases):
+    """
+    Returns a list of lines describing the phases returned by report.
+    """
+    return ["{:<18} {:9.4f}s {:8} calls {:11} rows".format(
+        x['phase'], x['seconds'], x['calls'], x['rows']) for x in phases]
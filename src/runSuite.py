@@ -1,120 +1,169 @@
 #!/usr/bin/python3
-from data import Data
-from decisionTree import DecisionNode, DecisionTree, RandomForest
-import examples
-import sys
+from data import deriveSeed
+from evaluation import submitTreeCounts, summarizeTreeCounts
+from examples import DATASETS
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
 import logging
-
-def evaluatePerformance(data, nForests=10, nTrees=10):
-    #Splits instances into folds
-    folds = data.generateStratifiedFolds(nForests)
-
-    allPerformances = []
-    allPrecisions = []
-    allRecalls = []
-    #Repeats using each fold as testing data once
-    for iteration in range(len(folds)):
-        #Adds one fold as testing data
-        testingData = Data(data.className, data.numericAttr)
-        for instance in folds[iteration]:
-            testingData.addInstance(instance)
-
-        #Adds the other folds as training data
-        trainingData = Data(data.className, data.numericAttr)
-        for i in range(len(folds)):
-            if i != iteration:  #Skips the fold used as testing set
-                for instance in folds[i]:
-                    trainingData.addInstance(instance)
-
-        #Creates and trains the forest
-        forest = RandomForest(trainingData, testingData)
-        forest.generateForest(nTrees)
-
-        #Classifies the testing set
-        predictions = []
-        for instance in forest.testingData.instances:
-            predictions.append(forest.classify(instance))
-
-        #Analizes results
-        iterationPerformances = []
-        iterationPrecisions = []
-        iterationRecalls = []
-        #Calculates performance, recall and precision for every class
-        for classValue in forest.testingData.listClassValues():
-            positiveClass = classValue
-
-            truePositives = 0
-            falsePositives = 0
-            trueNegatives = 0
-            falseNegatives = 0
-            for i in range(len(predictions)):
-                if predictions[i] == positiveClass:   #Predicted positive
-                    if forest.testingData.instances[i][forest.testingData.className] == positiveClass:    #Supposed to be positive
-                        truePositives += 1
-                    else:    #Supposed to be negative
-                        falsePositives +=1
-                else:   #Predicted negative
-                    if forest.testingData.instances[i][forest.testingData.className] != positiveClass:    #Supposed to be negative
-                        trueNegatives +=1
-                    else:    #Supposed to be positive
-                        falseNegatives += 1
-
-            iterationPerformances.append((truePositives+trueNegatives)/len(predictions))    #Right guesses
-            iterationPrecisions.append(truePositives / (truePositives + falsePositives))    #Right guesses from instances guessed positive
-            iterationRecalls.append(truePositives / (truePositives + falseNegatives))   #Right guesses from instances that were supposed to be positive
-
-        #Calculates average performance, recall and precision for this iteration
-        iterationAvgPerformance = sum(iterationPerformances)/len(iterationPerformances)
-        iterationAvgPrecision = sum(iterationPrecisions)/len(iterationPrecisions)
-        iterationAvgRecall = sum(iterationRecalls)/len(iterationRecalls)
-
-        print("----- Forest {} -----".format(iteration))
-        forest.evaluateTreesPerformance()
-        print("Forest performance: {:.2f}% of guesses (precision: {:.2f}% / recall: {:.2f}%)".format(iterationAvgPerformance*100, iterationAvgPrecision*100, iterationAvgRecall*100))
-
-        allPerformances.append(iterationAvgPerformance)   #Adds this iteration's performance to the list
-        allPrecisions.append(iterationAvgPrecision)   #Adds this iteration's precision to the list
-        allRecalls.append(iterationAvgRecall)   #Adds this iteration's recall to the list
-
-    #Calculates averages for all iterations
-    avgPerformance = sum(allPerformances)/len(allPerformances)
-    avgPrecision = sum(allPrecisions)/len(allPrecisions)
-    avgRecall = sum(allRecalls)/len(allRecalls)
-    #Calculates F1-Measure for all iterations
-    f1 = (2*avgPrecision*avgRecall) / (avgPrecision+avgRecall)
-
-    # print("----------")
-    # print("Model's average performance ({} trees): {:.2f}% (precision: {:.2f}% / recall: {:.2f}%)".format(nTrees, avgPerformance*100, avgPrecision*100, avgRecall*100))
-    # print("F1-measure from averages: {:.2f}%".format(f1*100))
-    # print("----------")
-    dic = {'nTrees': nTrees, 'avgPerformance': avgPerformance*100, 
-           'avgPrecision': avgPrecision*100, 'avgRecall': avgRecall*100,
-           'f1measure': f1*100}
-    return dic
-
-
-logging.basicConfig(filename='out.log', filemode='w', format='%(message)s', level=logging.INFO)
-start = 41
-maxTrees = 50
-numRep = 3
-print("------------------------- German Credit Data Set")
-logging.info("German Credit Data Set")
-data = examples.setupCredit()
-for i in range(start, maxTrees+1):
-    print("Running with {} trees".format(i))
-    sumDic = {}
+import os
+import random
+import profiling
+
+def readCheckpoint(filename):
+    '''
+    Reads a checkpoint written by writeCheckpoint.
+    Returns a tuple with the settings of the sweep (None when there is no checkpoint
+    yet) and a dictionary mapping each completed (nTrees, repetition) to its result.
+    '''
+    if not os.path.exists(filename):
+        return None, {}
+    with open(filename) as checkpointFile:
+        checkpoint = json.load(checkpointFile)
+    results = {(entry['nTrees'], entry['repetition']): entry['result']
+               for entry in checkpoint['results']}
+    return checkpoint['settings'], results
+
+def writeCheckpoint(filename, settings, results):
+    '''
+    Writes the settings of the sweep and its completed results to 'filename'. The file
+    is replaced at once, so an interrupted write leaves the previous checkpoint intact.
+    '''
+    checkpoint = {'settings': settings,
+                  'results': [{'nTrees': nTrees, 'repetition': repetition, 'result': result}
+                              for (nTrees, repetition), result in sorted(results.items())]}
+    temporary = filename + '.tmp'
+    with open(temporary, mode='w') as checkpointFile:
+        json.dump(checkpoint, checkpointFile, indent=1)
+        checkpointFile.flush()
+        os.fsync(checkpointFile.fileno())
+    os.replace(temporary, filename)
+
+def logProfile(foldResults):
+    '''
+    Logs the profile of every fold, from results of evaluateFold with profiling enabled.
+    '''
+    for iteration, result in enumerate(foldResults):
+        profile = result['profile']
+        logging.info("Profile of fold {}: {} trees, {} nodes, {} leaves, max depth {}".format(
+            iteration, len(profile['trees']), profile['nodes'], profile['leaves'],
+            profile['maxDepth']))
+        for line in profiling.formatReport(profile['phases']):
+            logging.info("    " + line)
+
+def enableWorkerProfiling():
+    '''
+    Initializer of the worker processes when profiling. Forked workers start with the
+    records of the parent, which would be reported twice.
+    '''
+    profiling.reset()
+    profiling.enable()
+
+def runSweep(data, treeCounts, numRep, settings, checkpoint, nJobs=1, profile=False):
+    '''
+    Evaluates forests with every number of trees in 'treeCounts', repeating the cross
+    validation 'numRep' times with seeds derived from settings['seed']. Every completed
+    (nTrees, repetition) is saved to the 'checkpoint' file and the ones already there
+    are skipped, so an interrupted sweep resumes where it stopped.
+    Returns a dictionary mapping every (nTrees, repetition) to the dictionary returned
+    by summarizeFolds.
+    '''
+    savedSettings, results = readCheckpoint(checkpoint)
+    if savedSettings is not None and savedSettings != settings:
+        raise ValueError("Checkpoint '{}' was written with settings {}".format(
+            checkpoint, savedSettings))
+
+    # Tree counts still missing from each repetition
+    missing = {}
     for j in range(numRep):
-        curDic = evaluatePerformance(data, nForests=10, nTrees=i)
-        # Accumulate values in sum dictionary
-        for key in curDic:
-            if key in sumDic:
-                sumDic[key] += curDic[key]  
-            else:
-                sumDic[key] = curDic[key]
-
-    # Calculate average for each value
-    for key in sumDic:
-        sumDic[key] = sumDic[key]/numRep
-
-    # Log results
-    logging.info(sumDic)
+        counts = [nTrees for nTrees in treeCounts if (nTrees, j) not in results]
+        if len(counts) > 0:
+            missing[j] = counts
+    logging.info("{} of {} points in the checkpoint".format(
+        len(treeCounts)*numRep - sum(map(len, missing.values())), len(treeCounts)*numRep))
+
+    # Every fold of every repetition is evaluated in parallel, the trees of each fold
+    # are trained serially. Each fold trains a forest with as many trees as the largest
+    # missing count once and evaluates all of its prefixes, which match forests trained
+    # with that number of trees
+    with ProcessPoolExecutor(max_workers=nJobs,
+                             initializer=enableWorkerProfiling if profile else None) as executor:
+        pending = [(j, counts, submitTreeCounts(executor, data, counts, settings['folds'],
+                                                seed=deriveSeed(settings['seed'],
+                                                                'repetition', j)))
+                   for j, counts in missing.items()]
+        for j, counts, futures in pending:
+            foldResults = [future.result() for future in futures]
+            if profile:
+                logProfile([result[-1] for result in foldResults])
+            for nTrees, result in zip(counts, summarizeTreeCounts(foldResults, counts)):
+                results[(nTrees, j)] = result
+            writeCheckpoint(checkpoint, settings, results)
+            logging.info("Repetition {} saved to {}".format(j, checkpoint))
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Evaluates forests of every size in a "
+                                                 "range with repeated cross validation, "
+                                                 "resuming from a checkpoint")
+    parser.add_argument('dataset', nargs='?', default='credit', choices=sorted(DATASETS))
+    parser.add_argument('--start', type=int, default=41, help="smallest number of trees")
+    parser.add_argument('--max-trees', type=int, default=50, help="largest number of trees")
+    parser.add_argument('--reps', type=int, default=3,
+                        help="number of times the cross validation is repeated")
+    parser.add_argument('--folds', type=int, default=10)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help="worker processes evaluating the folds")
+    parser.add_argument('--seed', type=int,
+                        help="seed of the sweep (default: the checkpoint's or a random one)")
+    parser.add_argument('--checkpoint',
+                        help="file holding the completed results (default: "
+                             "<dataset>.sweep.json), delete it to start over")
+    parser.add_argument('--log', default='out.log', help="file the averages are logged to")
+    parser.add_argument('--profile', action='store_true',
+                        help="log where the time of each fold goes")
+    args = parser.parse_args()
+
+    logging.basicConfig(filename=args.log, filemode='w', format='%(message)s', level=logging.INFO)
+    checkpoint = args.checkpoint or '{}.sweep.json'.format(args.dataset)
+    # Every repetition derives its folds and forests from the seed, which is kept in the
+    # checkpoint so a resumed sweep continues with the same one
+    seed = args.seed
+    if seed is None:
+        savedSettings = readCheckpoint(checkpoint)[0]
+        seed = savedSettings['seed'] if savedSettings is not None else random.getrandbits(64)
+    settings = {'dataset': args.dataset, 'folds': args.folds, 'seed': seed}
+    if args.profile:
+        profiling.enable()
+
+    print("------------------------- {}".format(args.dataset))
+    logging.info("Dataset: {}".format(args.dataset))
+    logging.info("Seed: {}".format(seed))
+    data = DATASETS[args.dataset]()
+    treeCounts = list(range(args.start, args.max_trees+1))
+    try:
+        results = runSweep(data, treeCounts, args.reps, settings, checkpoint, args.jobs,
+                           args.profile)
+    except ValueError as error:
+        parser.error("{}, use another --checkpoint or the same settings".format(error))
+
+    for nTrees in treeCounts:
+        print("Running with {} trees".format(nTrees))
+        sumDic = {}
+        for j in range(args.reps):
+            curDic = results[(nTrees, j)]
+            # Accumulate values in sum dictionary
+            for key in curDic:
+                if key in sumDic:
+                    sumDic[key] += curDic[key]
+                else:
+                    sumDic[key] = curDic[key]
+
+        # Calculate average for each value
+        for key in sumDic:
+            sumDic[key] = sumDic[key]/args.reps
+
+        # Log results
+        logging.info(sumDic)
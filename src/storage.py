@@ -0,0 +1,86 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+# Header: magic, format version and size of the JSON metadata that follows it
+HEADER = struct.Struct('<4sII')
+# Arrays start at offsets multiple of this
+ALIGNMENT = 8
+
+
+def writeArrays(filename, magic, version, meta, arrays):
+    """
+    Writes a versioned binary file containing the 'meta' dictionary (as JSON) followed
+    by the raw contents of every array, aligned so they can be memory-mapped.
+    :param arrays: dictionary mapping names to array.array objects, or memoryviews
+                   like the ones returned by readArrays
+    """
+    # Arrays and memoryviews are written through the same buffer interface
+    arrays = {name: memoryview(values) for name, values in arrays.items()}
+    layout = []
+    offset = 0
+    for name, values in arrays.items():
+        offset += -offset % ALIGNMENT
+        layout.append({'name': name, 'typecode': values.format,
+                       'itemsize': values.itemsize, 'offset': offset, 'length': len(values)})
+        offset += len(values)*values.itemsize
+
+    header = json.dumps({'meta': meta, 'arrays': layout, 'byteorder': sys.byteorder})
+    header = header.encode('utf-8')
+    start = HEADER.size + len(header)
+    start += -start % ALIGNMENT
+
+    with open(filename, mode='wb') as binFile:
+        binFile.write(HEADER.pack(magic, version, len(header)))
+        binFile.write(header)
+        binFile.write(bytes(start - HEADER.size - len(header)))
+        position = 0
+        for entry, values in zip(layout, arrays.values()):
+            binFile.write(bytes(entry['offset'] - position))
+            binFile.write(values.tobytes())
+            position = entry['offset'] + len(values)*values.itemsize
+
+
+def readArrays(filename, magic, version):
+    """
+    Memory-maps a file written by writeArrays. The arrays are returned as read-only
+    memoryviews over the mapping, so nothing is copied and processes loading the same
+    file share its pages.
+    :returns: tuple with the metadata dictionary and a dictionary mapping the names to
+              the arrays
+    """
+    with open(filename, mode='rb') as binFile:
+        data = mmap.mmap(binFile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(data) < HEADER.size:
+        raise ValueError("File '{}' is too short".format(filename))
+    fileMagic, fileVersion, headerSize = HEADER.unpack_from(data)
+    if fileMagic != magic:
+        raise ValueError("File '{}' is not of the expected type".format(filename))
+    if fileVersion != version:
+        raise ValueError("File '{}' has version {}, expected {}".format(filename, fileVersion,
+                                                                       version))
+    header = json.loads(data[HEADER.size:HEADER.size + headerSize].decode('utf-8'))
+    start = HEADER.size + headerSize
+    start += -start % ALIGNMENT
+
+    view = memoryview(data)
+    arrays = {}
+    for entry in header['arrays']:
+        if array(entry['typecode']).itemsize != entry['itemsize']:
+            raise ValueError("Array '{}' has an incompatible item size".format(entry['name']))
+        begin = start + entry['offset']
+        end = begin + entry['length']*entry['itemsize']
+        if end > len(data):
+            raise ValueError("File '{}' is truncated".format(filename))
+        if header['byteorder'] == sys.byteorder:
+            arrays[entry['name']] = view[begin:end].cast(entry['typecode'])
+        else:
+            # Written on a machine with another byte order, needs a converted copy
+            values = array(entry['typecode'], view[begin:end].tobytes())
+            values.byteswap()
+            arrays[entry['name']] = values
+
+    return header['meta'], arrays
@@ -0,0 +1,247 @@
+import csv
+from array import array
+from bisect import bisect_left
+from storage import writeArrays, readArrays
+
+# Identifies table files written by Table.save
+TABLE_MAGIC = b'RFTB'
+TABLE_VERSION = 1
+
+
+def readCsv(csvFile, delimiter, quotechar, chunkSize=10000):
+    """
+    Reads an open CSV file in chunks of at most 'chunkSize' rows, skipping blank lines.
+    :returns: generator of (header, rows) tuples, where rows are lists of raw values in
+              the order of the header
+    """
+    reader = csv.reader(csvFile, delimiter=delimiter, quotechar=quotechar)
+    header = next(reader, None)
+    if header is None:
+        return
+
+    chunk = []
+    for row in reader:
+        if len(row) == 0:
+            continue
+        chunk.append(row)
+        if len(chunk) == chunkSize:
+            yield header, chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield header, chunk
+
+
+class Table(object):
+    """
+    Column oriented storage for a dataset. Numeric attributes are parsed once into
+    arrays of floats, every other attribute (including the class) is dictionary encoded
+    into small integer codes.
+    """
+
+    def __init__(self, className, numeric=[]):
+        self.className = className
+        self.numericAttr = numeric
+        self.numericSet = set(numeric) - {className}
+        self.keys = []
+        self.keySet = set()
+        self.attributes = []
+        # attr -> array('d') for numeric attributes, array('i') of codes otherwise
+        self.columns = {}
+        # attr -> list of labels indexed by code
+        self.labels = {}
+        # attr -> dictionary mapping each label to its code
+        self.codes = {}
+        # attr -> (rows, array('B') of bin codes, list of bin upper edges), see binned
+        self.bins = {}
+        self.size = 0
+        # True while the columns are memoryviews over a file, see load
+        self.mapped = False
+
+    def __repr__(self):
+        return "<Table {} rows {} -> {}>".format(self.size, self.attributes, self.className)
+
+    def __len__(self):
+        return self.size
+
+    def __getstate__(self):
+        # Columns loaded from a file are memoryviews, which can't be pickled
+        state = self.__dict__.copy()
+        state['columns'] = {key: self.writableColumn(key) for key in self.columns}
+        state['mapped'] = False
+        return state
+
+    def writableColumn(self, key):
+        """
+        Returns the column as an array, copying it if it was loaded from a file.
+        """
+        column = self.columns[key]
+        if not isinstance(column, array):
+            column = array(column.format, column)
+        return column
+
+    def makeWritable(self):
+        """
+        Copies the columns loaded from a file into arrays, so rows can be appended.
+        """
+        if self.mapped:
+            for key in self.columns:
+                self.columns[key] = self.writableColumn(key)
+            self.mapped = False
+
+    def save(self, filename, meta={}):
+        """
+        Writes the table to a binary file which can be read with load.
+        :param meta: extra information stored with the table
+        """
+        tableMeta = {'className': self.className, 'numeric': self.numericAttr,
+                     'keys': self.keys, 'labels': self.labels, 'extra': meta}
+        writeArrays(filename, TABLE_MAGIC, TABLE_VERSION, tableMeta,
+                    {key: self.columns[key] for key in self.keys})
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Reads a table written by save. The columns are memory-mapped and only copied
+        if rows are appended to the table.
+        :returns: tuple with the table and the extra information given to save
+        """
+        meta, arrays = readArrays(filename, TABLE_MAGIC, TABLE_VERSION)
+        table = cls(meta['className'], meta['numeric'])
+        table.setKeys(meta['keys'])
+        for key in table.keys:
+            table.columns[key] = arrays[key]
+            if not table.isNumeric(key):
+                table.labels[key] = meta['labels'][key]
+                table.codes[key] = {label: code for code, label in enumerate(table.labels[key])}
+        table.size = len(arrays[table.keys[0]]) if len(table.keys) > 0 else 0
+        table.mapped = True
+        return table, meta['extra']
+
+    def isNumeric(self, attrName):
+        return attrName in self.numericSet
+
+    def setKeys(self, keys):
+        """
+        Creates an empty column for each key.
+        """
+        self.keys = list(keys)
+        self.keySet = set(self.keys)
+        self.attributes = [x for x in self.keys if x != self.className]
+        for key in self.keys:
+            if self.isNumeric(key):
+                self.columns[key] = array('d')
+            else:
+                self.columns[key] = array('i')
+                self.labels[key] = []
+                self.codes[key] = {}
+
+    def encode(self, attr, label):
+        """
+        Returns the code for a categoric label, registering it if it is new.
+        """
+        codes = self.codes[attr]
+        code = codes.get(label)
+        if code is None:
+            code = len(codes)
+            codes[label] = code
+            self.labels[attr].append(label)
+        return code
+
+    def appendRow(self, row):
+        """
+        Appends a dictionary mapping every key to its raw value.
+        """
+        if self.size == 0 and len(self.keys) == 0:
+            self.setKeys(row.keys())
+        elif row.keys() != self.keySet:
+            raise ValueError("Keys for new instance '{}' don`t match previous instances".format(row))
+        # Converted first, so a bad value leaves the table as it was
+        numeric = {key: float(row[key]) for key in self.keys if key in self.numericSet}
+        self.makeWritable()
+
+        for key in self.keys:
+            if key in self.numericSet:
+                self.columns[key].append(numeric[key])
+            else:
+                self.columns[key].append(self.encode(key, row[key]))
+        self.size += 1
+        self.bins = {}
+
+    def appendChunk(self, header, rows):
+        """
+        Appends rows given as lists of raw values in the order of 'header', converting
+        and encoding one column at a time.
+        """
+        if self.size == 0 and len(self.keys) == 0:
+            self.setKeys(header)
+        elif len(header) != len(self.keys) or set(header) != self.keySet:
+            raise ValueError("Keys '{}' don`t match previous instances".format(header))
+
+        for row in rows:
+            if len(row) != len(header):
+                raise ValueError("Instance '{}' should have {} values".format(row, len(header)))
+
+        # Numeric values are converted before any column grows, so a bad value leaves
+        # the table as it was. Encoding categoric values can't fail
+        columns = list(zip(header, zip(*rows)))
+        numeric = {key: array('d', map(float, values)) for key, values in columns
+                   if key in self.numericSet}
+        self.makeWritable()
+
+        for key, values in columns:
+            if key in self.numericSet:
+                self.columns[key].extend(numeric[key])
+            else:
+                codes = self.codes[key]
+                self.columns[key].extend([codes[x] if x in codes else self.encode(key, x)
+                                          for x in values])
+        self.size += len(rows)
+        self.bins = {}
+
+    def value(self, attr, index):
+        """
+        Returns the decoded value of an attribute for the row at 'index'.
+        """
+        if self.isNumeric(attr):
+            return self.columns[attr][index]
+        return self.labels[attr][self.columns[attr][index]]
+
+    def row(self, index, keys=None):
+        """
+        Decodes the row at 'index' back into a dictionary.
+        """
+        if keys is None:
+            keys = self.keys
+        row = {}
+        for key in keys:
+            if key in self.numericSet:
+                row[key] = self.columns[key][index]
+            else:
+                row[key] = self.labels[key][self.columns[key][index]]
+        return row
+
+    def binned(self, attr, rows=None, maxBins=256):
+        """
+        Quantizes a numeric column into at most 'maxBins' bins holding roughly the same
+        number of rows. The edges only depend on the values of 'rows' (all rows when
+        None), so the instances held out for testing don't shape them. It is cached
+        for the last 'rows' given.
+        :returns: tuple with an array('B') containing the bin of each row and the list of
+                  bin upper edges. A value v falls into bin b if edges[b-1] < v <= edges[b],
+                  values of other rows above the last edge fall into the last bin
+        """
+        entry = self.bins.get(attr)
+        if entry is None or entry[0] is not rows:
+            column = self.columns[attr]
+            values = sorted(column if rows is None else map(column.__getitem__, rows))
+            edges = list(dict.fromkeys(values))
+            if len(edges) > maxBins:
+                edges = []
+                for i in range(1, maxBins + 1):
+                    edge = values[len(values)*i//maxBins - 1]
+                    if len(edges) == 0 or edge > edges[-1]:
+                        edges.append(edge)
+            last = len(edges) - 1
+            codes = array('B', [min(bisect_left(edges, x), last) for x in column])
+            entry = self.bins[attr] = (rows, codes, edges)
+        return entry[1], entry[2]
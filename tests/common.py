@@ -0,0 +1,22 @@
+import os
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+DATA = os.path.join(SRC, '..', 'data')
+sys.path.insert(0, SRC)
+
+from data import Data
+
+
+def loadVertebra():
+    data = Data('Class', numeric=['V1', 'V2', 'V3', 'V4', 'V5', 'V6'])
+    data.parseFromFile(os.path.join(DATA, 'vertebra-column.csv'), delimiter=',',
+                       quotechar='"')
+    return data
+
+
+def loadWeather():
+    data = Data('Joga')
+    data.parseFromFile(os.path.join(DATA, 'dadosBenchmark_validacaoAlgoritmoAD.csv'),
+                       delimiter=';', quotechar='"')
+    return data
@@ -0,0 +1,40 @@
+import contextlib
+import io
+import unittest
+
+import common   # Puts src on the path
+from benchmark import bestTime, compareResults
+
+
+def result(seconds, rowsPerSecond, peak=1000):
+    return {'dataset': 'wine', 'scale': 1, 'rows': 178, 'trees': 10, 'classifyRows': 178,
+            'parseSeconds': seconds, 'cachedLoadSeconds': seconds,
+            'trainSecondsPerTree': seconds, 'classifyRowsPerSecond': rowsPerSecond,
+            'batchRowsPerSecond': rowsPerSecond, 'peakRssKb': peak}
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def compare(self, before, after):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return compareResults({'results': [before]}, {'results': [after]})
+
+    def testShortTimingsAreNotCompared(self):
+        # Twice as slow, but every timing is well under the floor
+        self.assertEqual(self.compare(result(0.0005, 1e6), result(0.001, 5e5)), 0)
+
+    def testLongTimingsAreCompared(self):
+        self.assertEqual(self.compare(result(1.0, 100), result(1.0, 100)), 0)
+        self.assertEqual(self.compare(result(1.0, 100), result(2.0, 50)), 5)
+        self.assertEqual(self.compare(result(1.0, 100, 1000), result(1.0, 100, 2000)), 1)
+
+    def testBestTime(self):
+        calls = []
+        seconds, value = bestTime(lambda: calls.append(1) or len(calls), 3)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(value, 3)
+        self.assertGreaterEqual(seconds, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+from common import DATA
+from data import Data
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.csv = os.path.join(self.directory, 'vertebra.csv')
+        shutil.copy(os.path.join(DATA, 'vertebra-column.csv'), self.csv)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def load(self, numeric=['V1', 'V2', 'V3', 'V4', 'V5', 'V6']):
+        data = Data('Class', numeric=numeric)
+        stats = data.parseFromFile(self.csv, delimiter=',', quotechar='"', cache=True)
+        return data, stats['cached']
+
+    def testSecondLoadIsCached(self):
+        parsed, cached = self.load()
+        self.assertFalse(cached)
+        loaded, cached = self.load()
+        self.assertTrue(cached)
+        self.assertEqual(loaded.size(), parsed.size())
+        for key in parsed.keys:
+            self.assertEqual(list(loaded.column(key)), list(parsed.column(key)))
+        self.assertEqual(loaded.table.labels, parsed.table.labels)
+
+    def testChangedFileRebuildsCache(self):
+        self.load()
+        with open(self.csv, mode='a') as csvFile:
+            csvFile.write("1,2,3,4,5,6,Abnormal\n")
+        stat = os.stat(self.csv)
+        os.utime(self.csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        data, cached = self.load()
+        self.assertFalse(cached)
+        self.assertEqual(data.size(), 311)
+        self.assertTrue(self.load()[1])
+
+    def testOptionsGetTheirOwnCache(self):
+        self.load()
+        data, cached = self.load(numeric=['V1'])
+        self.assertFalse(cached)
+        self.assertFalse(data.isNumeric('V2'))
+        self.assertEqual(len(glob.glob(self.csv + '.*.tblcache')), 2)
+
+    def testCorruptCacheIsIgnored(self):
+        self.load()
+        for cacheFile in glob.glob(self.csv + '.*.tblcache'):
+            with open(cacheFile, mode='wb') as binFile:
+                binFile.write(b'garbage')
+        with self.assertLogs('data', level='WARNING'):
+            data, cached = self.load()
+        self.assertFalse(cached)
+        self.assertEqual(data.size(), 310)
+
+    def testCachedTableCanGrow(self):
+        self.load()
+        data, cached = self.load()
+        self.assertTrue(cached)
+        data.table.appendChunk(data.table.keys, [['1'] * 6 + ['Normal']])
+        self.assertEqual(data.table.size, 311)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import io
+import unittest
+
+from common import loadVertebra, loadWeather
+from compiled import CompiledForest
+from decisionTree import RandomForest
+
+
+class CompiledForestTest(unittest.TestCase):
+
+    def testBatchMatchesClassify(self):
+        for data in (loadVertebra(), loadWeather()):
+            forest = RandomForest(data.view(None), None, seed=2)
+            forest.generateForest(5)
+            compiled = forest.compile()
+            self.assertEqual(compiled.predictBatch(data),
+                             [forest.classify(instance) for instance in data.instances])
+            self.assertEqual(compiled.predictBatch(data, 3),
+                             [forest.classify(instance, 3) for instance in data.instances])
+
+    def testNanGoesToTheHigherPart(self):
+        data = loadVertebra()
+        column = data.table.columns['V1']
+        for row in range(0, len(column), 7):
+            column[row] = float('nan')
+        parts = data.split('V1', 50.0)
+        self.assertIn(0, parts[True].indices)
+        self.assertNotIn(0, parts[False].indices)
+
+        # Training and both ways of classifying agree on where NaN goes
+        forest = RandomForest(data.view(None), None, seed=4)
+        forest.generateForest(5)
+        self.assertEqual(forest.compile().predictBatch(data),
+                         [forest.classify(instance) for instance in data.instances])
+
+    def testScoreCsvMatchesBatch(self):
+        data = loadWeather()
+        forest = RandomForest(data.view(None), None, seed=1)
+        forest.generateForest(3)
+        compiled = forest.compile()
+        keys = [key for key in data.table.keys if key != data.className]
+        lines = [';'.join(keys)] + [';'.join(instance[key] for key in keys)
+                                    for instance in data.instances]
+        output = io.StringIO()
+        stats = compiled.scoreCsv(io.StringIO('\n'.join(lines)), output, delimiter=';',
+                                  chunkSize=4)
+        self.assertEqual(stats['rows'], data.size())
+        self.assertEqual(output.getvalue().split(), compiled.predictBatch(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
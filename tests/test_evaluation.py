@@ -0,0 +1,39 @@
+import unittest
+
+from common import loadVertebra
+from decisionTree import RandomForest
+from evaluation import evaluatePerformance, evaluateTreeCounts
+
+
+class EvaluationTest(unittest.TestCase):
+
+    def testTreeCountsMatchSeparateRuns(self):
+        # Prefixes of the largest forest give the results of forests of that size
+        data = loadVertebra()
+        results = evaluateTreeCounts(data, [2, 5], nForests=3, seed=42)
+        for result in results:
+            expected = evaluatePerformance(data, nForests=3, nTrees=result['nTrees'], seed=42)
+            self.assertEqual(result, expected)
+
+    def testGrowingMatchesTrainingAtOnce(self):
+        data = loadVertebra()
+        grown = RandomForest(data.view(None), None, seed=9)
+        grown.generateForest(2)
+        grown.generateForest(3)
+        once = RandomForest(data.view(None), None, seed=9)
+        once.generateForest(5)
+        self.assertEqual(grown.compile().predictTrees(data), once.compile().predictTrees(data))
+        self.assertEqual(grown.outOfBagPredictions(), once.outOfBagPredictions())
+        self.assertEqual(once.compile(2).predictBatch(data),
+                         [once.classify(instance, 2) for instance in data.instances])
+
+    def testSeedGivesSameResults(self):
+        data = loadVertebra()
+        first = evaluatePerformance(data, nForests=3, nTrees=3, seed=5)
+        self.assertEqual(evaluatePerformance(data, nForests=3, nTrees=3, seed=5), first)
+        self.assertEqual(evaluatePerformance(data, nForests=3, nTrees=3, nJobs=2, seed=5),
+                         first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import contextlib
+import io
+import unittest
+from array import array
+
+from common import loadVertebra
+from decisionTree import DecisionTree, RandomForest
+
+
+class HistogramTest(unittest.TestCase):
+
+    def testBinnedEdges(self):
+        table = loadVertebra().table
+        codes, edges = table.binned('V1', maxBins=16)
+        self.assertLessEqual(len(edges), 16)
+        self.assertEqual(edges, sorted(set(edges)))
+        for value, code in zip(table.columns['V1'], codes):
+            self.assertLessEqual(value, edges[code])
+            if code > 0:
+                self.assertGreater(value, edges[code - 1])
+
+    def testSubtractedHistogramMatchesCount(self):
+        data = loadVertebra()
+        data.binHistogram('V2')
+        parts = data.split('V1', 50.0)
+        largest = max(parts.values(), key=lambda part: part.size())
+        self.assertIsNotNone(largest.derivedFrom)
+        counted = largest.view(largest.indices)
+        self.assertEqual(largest.binHistogram('V2'), counted.binHistogram('V2'))
+
+    def testBinSummaryMatchesNumericSummary(self):
+        data = loadVertebra()
+        for edge in data.binned('V3')[1][:-1:10]:
+            self.assertEqual(data.summarizeBins('V3', edge), data.summarizeNumeric('V3', edge))
+
+    def testBestBinThreshold(self):
+        # With a bin per value, the histogram search finds an edge as good as the exact one
+        data = loadVertebra()
+        threshold = data.bestBinThreshold('V6')
+        self.assertIn(threshold, data.binned('V6')[1])
+        exact = data.bestThreshold('V6')
+        below = max(x for x in data.column('V6') if x <= exact)
+        self.assertEqual(threshold, below)
+
+    def testBinsOnlyUseTrainingRows(self):
+        data = loadVertebra()
+        trainingRows = array('i', range(0, data.size(), 2))
+        training = data.view(trainingRows)
+        forest = RandomForest(training, None, numericSplit='histogram', seed=1)
+        forest.generateForest(2)
+        trainingValues = set(training.column('V1'))
+        edges = forest.trees[0].data.binned('V1')[1]
+        self.assertTrue(set(edges) <= trainingValues)
+
+    def testDisplayShowsZeroThresholds(self):
+        data = loadVertebra()
+        tree = DecisionTree(data=data.view(None), seed=1)
+        tree.train()
+        tree.root.numeric = 0.0
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            tree.display()
+        self.assertIn("({})".format(0.0), output.getvalue().splitlines()[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
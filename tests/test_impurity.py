@@ -0,0 +1,70 @@
+import unittest
+from math import log2
+
+from common import loadVertebra, loadWeather
+from decisionTree import DecisionTree, RandomForest
+from impurity import evaluateSplits, impurity, nlognTable
+
+
+def entropy(counts):
+    total = sum(counts)
+    return -sum(c/total*log2(c/total) for c in counts if c > 0)
+
+
+def gini(counts):
+    total = sum(counts)
+    return 1 - sum((c/total)**2 for c in counts)
+
+
+class ImpurityTest(unittest.TestCase):
+
+    def testKnownValues(self):
+        self.assertAlmostEqual(impurity([5, 5]), 1.0)
+        self.assertAlmostEqual(impurity([5, 5], 'gini'), 0.5)
+        self.assertEqual(impurity([7, 0]), 0.0)
+        self.assertEqual(impurity([7, 0], 'gini'), 0.0)
+        self.assertEqual(impurity([0, 0], 'gini'), 0.0)
+        self.assertAlmostEqual(impurity([9, 5]), entropy([9, 5]))
+        self.assertAlmostEqual(impurity([3, 2, 6], 'gini'), gini([3, 2, 6]))
+
+    def testNlognTable(self):
+        table = nlognTable(20)
+        self.assertEqual(table[0], 0.0)
+        for x in range(1, 21):
+            self.assertAlmostEqual(table[x], x*log2(x))
+
+    def testEvaluateSplits(self):
+        parent = [9, 5]
+        splits = [[[2, 3], [4, 0], [3, 2]], [[6, 2], [3, 3]], [[9, 5]]]
+        for criterion, measure in (('entropy', entropy), ('gini', gini)):
+            results = evaluateSplits(parent, splits, criterion)
+            for (child, gain), split in zip(results, splits):
+                expected = sum(sum(part)/14*measure(part) for part in split)
+                self.assertAlmostEqual(child, expected)
+                self.assertAlmostEqual(gain, measure(parent) - expected)
+        self.assertEqual(evaluateSplits([0, 0], splits), [(0.0, 0.0)]*3)
+
+    def testGiniForest(self):
+        data = loadVertebra()
+        forest = RandomForest(data.view(None), None, seed=3, criterion='gini')
+        forest.generateForest(3)
+        self.assertEqual(forest.compile().predictBatch(data),
+                         [forest.classify(instance) for instance in data.instances])
+
+    def testGiniTreeFitsTrainingData(self):
+        data = loadWeather()
+        tree = DecisionTree(data, criterion='gini')
+        tree.train()
+        for instance in data.instances:
+            self.assertEqual(tree.classify(instance), instance['Joga'])
+
+    def testUnknownCriterion(self):
+        data = loadWeather()
+        with self.assertRaises(ValueError):
+            DecisionTree(data, criterion='variance')
+        with self.assertRaises(ValueError):
+            RandomForest(data, None, criterion='variance')
+
+
+if __name__ == '__main__':
+    unittest.main()
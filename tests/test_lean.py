@@ -0,0 +1,44 @@
+import pickle
+import unittest
+
+from common import loadVertebra
+from decisionTree import RandomForest
+
+
+class LeanTest(unittest.TestCase):
+
+    def testLeanForestMatchesFullForest(self):
+        data = loadVertebra()
+        full = RandomForest(data.view(None), None, seed=6)
+        full.generateForest(4)
+        lean = RandomForest(data.view(None), None, seed=6, lean=True)
+        lean.generateForest(4)
+        self.assertEqual(lean.compile().predictBatch(data), full.compile().predictBatch(data))
+        self.assertEqual(lean.treesPerformance(), full.treesPerformance())
+        for tree in lean.trees:
+            self.assertIsNone(tree.data)
+            self.assertIsNone(tree.testingData)
+
+    def testReleasedForestKeepsOnlyNodes(self):
+        data = loadVertebra()
+        forest = RandomForest(data.view(None), data.view(None), seed=6)
+        forest.generateForest(3)
+        expected = [forest.classify(instance) for instance in data.instances]
+        forest.release()
+
+        self.assertIsNone(forest.data)
+        self.assertIsNone(forest.testingData)
+        self.assertIsNone(forest.oobVotes)
+        for tree in forest.trees:
+            self.assertIsNone(tree.data)
+            self.assertIsNone(tree.oobRows)
+        self.assertEqual([forest.classify(instance) for instance in data.instances], expected)
+        with self.assertRaises(AttributeError):
+            forest.outOfBagPredictions()
+
+        # Nothing left refers to the table
+        self.assertNotIn(b'Table', pickle.dumps(forest))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from common import loadVertebra, loadWeather
+from data import levelContingencyTables
+from decisionTree import DecisionNode, DecisionTree, RandomForest
+
+
+class LevelTest(unittest.TestCase):
+
+    def testLevelSummariesMatchNodeSummaries(self):
+        for data in (loadVertebra(), loadWeather()):
+            tree = DecisionTree(data=data.view(None), seed=5)
+            nodes = []
+            for indices in ([0, 1, 2, 3, 4, 5, 6], [7, 8, 9, 10, 11, 12, 13]):
+                node = DecisionNode(data=data.view(indices), m=len(data.attributes))
+                node.sampleAttributes()
+                nodes.append(node)
+            tree.summarizeLevel(nodes)
+            for node in nodes:
+                for attr in node.sample:
+                    if data.isNumeric(attr):
+                        expected = node.data.summarizeNumeric(attr)
+                    else:
+                        expected = node.data.summarize(attr)
+                    self.assertEqual(node.summaries[attr], expected)
+
+    def testLevelTablesMatchContingencyTables(self):
+        data = loadWeather()
+        parts = [data.view([0, 2, 4]), data.view([1, 3, 5, 7])]
+        tasks = [(part, attr) for part in parts for attr in data.attributes]
+        counts, means = levelContingencyTables(tasks)
+        for (part, attr), count, mean in zip(tasks, counts, means):
+            self.assertIsNone(mean)
+            self.assertEqual(count, part.contingencyTable(attr))
+            self.assertEqual(list(count), list(part.contingencyTable(attr)))
+
+    def testBatchingDoesntChangeTrees(self):
+        data = loadVertebra()
+        for numericSplit in ('mean', 'best', 'histogram'):
+            batched = RandomForest(data.view(None), None, numericSplit=numericSplit, seed=3)
+            batched.generateForest(3)
+            unbatched = RandomForest(data.view(None), None, numericSplit=numericSplit, seed=3)
+            original = DecisionTree.summarizeLevel
+            DecisionTree.summarizeLevel = lambda self, nodes: None
+            try:
+                unbatched.generateForest(3)
+            finally:
+                DecisionTree.summarizeLevel = original
+            for tree, other in zip(batched.trees, unbatched.trees):
+                self.assertEqual(tree.compile().feature, other.compile().feature)
+                self.assertEqual(tree.compile().threshold, other.compile().threshold)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import pickle
+import unittest
+
+from common import loadVertebra
+from decisionTree import RandomForest
+
+
+class ParallelTrainingTest(unittest.TestCase):
+
+    def testParallelTrainingGivesSameForest(self):
+        data = loadVertebra()
+        serial = RandomForest(data.view(None), None, seed=7)
+        serial.generateForest(4)
+        parallel = RandomForest(data.view(None), None, seed=7)
+        parallel.generateForest(4, nJobs=2)
+        self.assertEqual(serial.compile().predictBatch(data),
+                         parallel.compile().predictBatch(data))
+        self.assertEqual(serial.oobPerformances, parallel.oobPerformances)
+        for serialTree, tree in zip(serial.trees, parallel.trees):
+            self.assertIs(tree.data.table, parallel.data.table)
+            self.assertEqual(tree.data.indices, serialTree.data.indices)
+
+    def testWorkerTreesComeBackWithoutData(self):
+        data = loadVertebra()
+        forest = RandomForest(data.view(None), None, seed=7, lean=True)
+        forest.generateForest(2, nJobs=2)
+        table = len(pickle.dumps(data.table))
+        for tree in forest.trees:
+            self.assertIsNone(tree.data)
+            self.assertLess(len(pickle.dumps(tree)), table)
+
+
+if __name__ == '__main__':
+    unittest.main()
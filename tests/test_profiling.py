@@ -0,0 +1,47 @@
+import unittest
+
+from common import loadVertebra
+from decisionTree import RandomForest
+import profiling
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def setUp(self):
+        profiling.reset()
+        profiling.enable()
+
+    def tearDown(self):
+        profiling.disable()
+        profiling.reset()
+
+    def testCallsDontDependOnJobs(self):
+        data = loadVertebra()
+        for nJobs in (1, 2):
+            profiling.reset()
+            forest = RandomForest(data.view(None), None, seed=1)
+            forest.generateForest(4, nJobs=nJobs)
+            calls = {x['phase']: x['calls'] for x in profiling.report()}
+            self.assertEqual(calls['train'], 4)
+            self.assertEqual(calls['bootstrap'], 4)
+
+    def testLeanTraining(self):
+        # Lean trees release their data before the call is recorded
+        data = loadVertebra()
+        for nJobs in (1, 2):
+            profiling.reset()
+            forest = RandomForest(data.view(None), None, seed=1, lean=True)
+            forest.generateForest(2, nJobs=nJobs)
+            train = [x for x in profiling.report() if x['phase'] == 'train'][0]
+            self.assertEqual(train['calls'], 2)
+            self.assertGreater(train['rows'], 0)
+
+    def testDisabledLeavesMethods(self):
+        profiling.disable()
+        forest = RandomForest(loadVertebra(), None, seed=1)
+        forest.generateForest(1)
+        self.assertEqual(profiling.report(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from common import loadVertebra
+from data import Data
+from decisionTree import DecisionNode, DecisionTree
+
+
+def internalNodes(tree):
+    nodes = []
+    pending = [tree.root]
+    while len(pending) > 0:
+        node = pending.pop()
+        if not node.leaf:
+            nodes.append(node)
+        pending.extend(node.children.values())
+    return nodes
+
+
+class PruningTest(unittest.TestCase):
+
+    def testMaxDepthAndLeaves(self):
+        data = loadVertebra()
+        tree = DecisionTree(data=data.view(None), seed=1, maxDepth=3)
+        tree.train()
+        self.assertLessEqual(tree.structure()['depth'], 3)
+        tree = DecisionTree(data=data.view(None), seed=1, maxLeafNodes=5)
+        tree.train()
+        self.assertLessEqual(tree.structure()['leaves'], 5)
+        tree = DecisionTree(data=data.view(None), seed=1, minSamplesSplit=data.size() + 1)
+        tree.train()
+        self.assertTrue(tree.root.leaf)
+
+    def testMinSamplesLeaf(self):
+        data = loadVertebra()
+        for numericSplit in ('mean', 'best', 'histogram'):
+            tree = DecisionTree(data=data.view(None), seed=1, numericSplit=numericSplit,
+                                minSamplesLeaf=20)
+            tree.train()
+            nodes = internalNodes(tree)
+            self.assertGreater(len(nodes), 0)
+            for node in nodes:
+                self.assertGreaterEqual(min(node.partSizes[node.attribute]), 20)
+
+    def testThresholdSearchRespectsMinSamplesLeaf(self):
+        # The best cut isolates the single 'b' instance, the best one leaving two
+        # instances in each part is 3.5 and none leaves three
+        data = Data('c', numeric=['x'])
+        for x, c in ((1, 'a'), (2, 'a'), (3, 'a'), (4, 'a'), (10, 'b')):
+            data.table.appendRow({'x': str(x), 'c': c})
+        data = data.view(None)
+        self.assertEqual(data.bestThreshold('x'), 7.0)
+        self.assertEqual(data.bestThreshold('x', minSamplesLeaf=2), 3.5)
+        self.assertIsNone(data.bestThreshold('x', minSamplesLeaf=3))
+        self.assertEqual(data.bestBinThreshold('x'), 4.0)
+        self.assertEqual(data.bestBinThreshold('x', minSamplesLeaf=2), 3.0)
+        self.assertIsNone(data.bestBinThreshold('x', minSamplesLeaf=3))
+
+        for numericSplit in ('best', 'histogram'):
+            node = DecisionNode(data=data, m=1, numericSplit=numericSplit, minSamplesLeaf=2)
+            node.evaluate()
+            self.assertEqual(node.attribute, 'x')
+
+    def testMinInfoGain(self):
+        data = loadVertebra()
+        tree = DecisionTree(data=data.view(None), seed=1, minInfoGain=0.2)
+        tree.train()
+        for node in internalNodes(tree):
+            self.assertGreaterEqual(node.gain, 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import random
+import unittest
+from collections import Counter
+
+from common import loadVertebra
+
+
+class SamplingTest(unittest.TestCase):
+
+    def classCounts(self, data, rows):
+        column = data.table.columns[data.className]
+        return Counter(column[row] for row in rows)
+
+    def testFoldsPartitionTheRows(self):
+        data = loadVertebra()
+        folds = data.generateStratifiedFolds(10, rng=random.Random(1))
+        self.assertEqual(len(folds), 10)
+        rows = [row for fold in folds for row in fold]
+        self.assertEqual(sorted(rows), list(range(data.size())))
+        sizes = [len(fold) for fold in folds]
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+
+    def testFoldsAreStratified(self):
+        data = loadVertebra()
+        total = self.classCounts(data, range(data.size()))
+        for fold in data.generateStratifiedFolds(5, rng=random.Random(2)):
+            counts = self.classCounts(data, fold)
+            for code in total:
+                self.assertAlmostEqual(counts[code], total[code]/5, delta=1)
+
+    def testFoldsOfAView(self):
+        data = loadVertebra()
+        view = data.view(list(range(100, 200)))
+        folds = view.generateStratifiedFolds(4, discardExtras=True, rng=random.Random(3))
+        rows = [row for fold in folds for row in fold]
+        self.assertEqual(len(rows), len(set(rows)))
+        self.assertTrue(set(rows) <= set(range(100, 200)))
+
+    def testFoldsDependOnlyOnSeed(self):
+        data = loadVertebra()
+        first = data.generateStratifiedFolds(3, rng=random.Random(4))
+        self.assertEqual(data.generateStratifiedFolds(3, rng=random.Random(4)), first)
+        self.assertNotEqual(data.generateStratifiedFolds(3, rng=random.Random(5)), first)
+
+    def testStratifiedBootstrap(self):
+        data = loadVertebra()
+        view = data.view(list(range(0, 310, 2)))
+        drawn, outOfBag = view.stratifiedBootstrap(random.Random(6))
+        self.assertEqual(self.classCounts(data, drawn), self.classCounts(data, view.indices))
+        self.assertEqual(sorted(set(drawn) | set(outOfBag)), list(view.indices))
+        self.assertFalse(set(drawn) & set(outOfBag))
+
+    def testBootstrap(self):
+        data = loadVertebra()
+        drawn, outOfBag = data.bootstrap(random.Random(7))
+        self.assertEqual(len(drawn), data.size())
+        self.assertEqual(sorted(set(drawn) | set(outOfBag)), list(range(data.size())))
+        self.assertFalse(set(drawn) & set(outOfBag))
+        self.assertEqual(data.bootstrap(random.Random(7)), (drawn, outOfBag))
+
+
+if __name__ == '__main__':
+    unittest.main()
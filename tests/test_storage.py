@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from array import array
+
+from common import loadVertebra
+from compiled import CompiledForest
+from decisionTree import RandomForest
+from storage import writeArrays, readArrays
+from table import Table
+
+
+class StorageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def testArraysRoundTrip(self):
+        arrays = {'a': array('i', [1, -2, 3]), 'b': array('d', [0.5]), 'c': array('B')}
+        writeArrays(self.path('x.bin'), b'TEST', 1, {'key': 'value'}, arrays)
+        meta, loaded = readArrays(self.path('x.bin'), b'TEST', 1)
+        self.assertEqual(meta, {'key': 'value'})
+        for name in arrays:
+            self.assertEqual(list(loaded[name]), list(arrays[name]))
+
+    def testWrongFileIsRejected(self):
+        writeArrays(self.path('x.bin'), b'TEST', 1, {}, {})
+        with self.assertRaises(ValueError):
+            readArrays(self.path('x.bin'), b'RFMD', 1)
+        with self.assertRaises(ValueError):
+            readArrays(self.path('x.bin'), b'TEST', 2)
+
+    def testSavedModelMatchesClassify(self):
+        data = loadVertebra()
+        forest = RandomForest(data.view(None), None, seed=3)
+        forest.generateForest(5)
+        forest.compile().save(self.path('forest.rfm'))
+        model = CompiledForest.load(self.path('forest.rfm'))
+        self.assertEqual(model.predictBatch(data),
+                         [forest.classify(instance) for instance in data.instances])
+
+    def testLoadedModelCanBeSavedAgain(self):
+        data = loadVertebra()
+        forest = RandomForest(data.view(None), None, seed=3)
+        forest.generateForest(3)
+        forest.compile().save(self.path('first.rfm'))
+        CompiledForest.load(self.path('first.rfm')).save(self.path('second.rfm'))
+        model = CompiledForest.load(self.path('second.rfm'))
+        self.assertEqual(model.predictBatch(data), forest.compile().predictBatch(data))
+
+    def testLoadedTableCanBeSavedAgain(self):
+        table = loadVertebra().table
+        table.save(self.path('first.tbl'))
+        loaded = Table.load(self.path('first.tbl'))[0]
+        loaded.save(self.path('second.tbl'))
+        again = Table.load(self.path('second.tbl'))[0]
+        self.assertEqual(again.size, table.size)
+        for key in table.keys:
+            self.assertEqual(list(again.columns[key]), list(table.columns[key]))
+        self.assertEqual(again.labels, table.labels)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import io
+import os
+import tempfile
+import unittest
+
+from data import Data
+from table import Table, readCsv
+
+
+class TableTest(unittest.TestCase):
+
+    def testReadCsvChunks(self):
+        csvFile = io.StringIO("a,b\n1,x\n\n2,y\n3,z\n")
+        chunks = list(readCsv(csvFile, ',', '"', chunkSize=2))
+        self.assertEqual(chunks, [(['a', 'b'], [['1', 'x'], ['2', 'y']]),
+                                  (['a', 'b'], [['3', 'z']])])
+
+    def testChunksMatchRows(self):
+        rows = [['1.5', 'x', 'p'], ['2', 'y', 'q'], ['-3', 'x', 'p']]
+        chunked = Table('c', ['a'])
+        chunked.appendChunk(['a', 'b', 'c'], rows[:2])
+        chunked.appendChunk(['a', 'b', 'c'], rows[2:])
+        single = Table('c', ['a'])
+        for row in rows:
+            single.appendRow(dict(zip(['a', 'b', 'c'], row)))
+        self.assertEqual(chunked.size, 3)
+        for key in ('a', 'b', 'c'):
+            self.assertEqual(list(chunked.columns[key]), list(single.columns[key]))
+        self.assertEqual(chunked.labels, single.labels)
+
+    def testBadChunkLeavesTableIntact(self):
+        table = Table('c', ['a', 'd'])
+        table.appendChunk(['b', 'a', 'c', 'd'], [['x', '1', 'p', '2']])
+        with self.assertRaises(ValueError):
+            table.appendChunk(['b', 'a', 'c', 'd'], [['y', '2', 'q', '3'], ['z', '3', 'r', 'bad']])
+        with self.assertRaises(ValueError):
+            table.appendChunk(['b', 'a', 'c', 'd'], [['y', '2', 'q']])
+        with self.assertRaises(ValueError):
+            table.appendRow({'b': 'y', 'a': '2', 'c': 'q', 'd': 'bad'})
+        self.assertEqual(table.size, 1)
+        self.assertEqual([len(table.columns[key]) for key in table.keys], [1, 1, 1, 1])
+        table.appendChunk(['b', 'a', 'c', 'd'], [['y', '2', 'q', '3']])
+        self.assertEqual(table.row(1), {'b': 'y', 'a': 2.0, 'c': 'q', 'd': 3.0})
+
+    def testParseErrorIsRaised(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'bad.csv')
+            with open(filename, mode='w') as csvFile:
+                csvFile.write("a,c\n1,p\nbad,q\n")
+            data = Data('c', numeric=['a'])
+            with self.assertRaises(ValueError):
+                data.parseFromFile(filename, delimiter=',', quotechar='"', chunkSize=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from common import loadVertebra
+from impurity import evaluateSplits, matrixParts
+
+
+class ThresholdTest(unittest.TestCase):
+
+    def info(self, data, attr, threshold, criterion):
+        m = data.summarizeNumeric(attr, threshold)
+        counts = list(data.classHistogram().values())
+        return evaluateSplits(counts, [matrixParts(m)], criterion)[0][0]
+
+    def testBestThresholdMatchesExhaustiveSearch(self):
+        data = loadVertebra().view(list(range(0, 310, 3)))
+        for criterion in ('entropy', 'gini'):
+            for attr in ('V1', 'V4', 'V6'):
+                values = sorted(set(data.column(attr)))
+                candidates = [a + (b - a)/2 for a, b in zip(values, values[1:])]
+                best = min(self.info(data, attr, x, criterion) for x in candidates)
+                threshold = data.bestThreshold(attr, criterion)
+                self.assertIn(threshold, candidates)
+                self.assertAlmostEqual(self.info(data, attr, threshold, criterion), best)
+
+    def testSameValuesHaveNoThreshold(self):
+        data = loadVertebra().view([0, 0, 0])
+        self.assertIsNone(data.bestThreshold('V1'))
+
+    def testIntegerThreshold(self):
+        data = loadVertebra()
+        self.assertEqual(data.summarizeNumeric('V1', 50), data.summarizeNumeric('V1', 50.0))
+        parts = data.split('V1', 50)
+        self.assertEqual(sorted(parts), [False, True])
+        self.assertEqual(parts[False].size() + parts[True].size(), data.size())
+        self.assertTrue(all(x <= 50 for x in parts[False].column('V1')))
+        self.assertTrue(all(x > 50 for x in parts[True].column('V1')))
+
+
+if __name__ == '__main__':
+    unittest.main()